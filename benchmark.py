@@ -0,0 +1,920 @@
+"""End-to-end benchmark of the web routes.
+
+Each size gets a fresh SQLite database seeded by ``bulk.generate`` and is
+driven through the Flask test client in its own process, since the app
+picks its database when it is imported. Per route it reports p50/p95
+latency, SQL statements per request and peak Python memory; free-spot
+counts for random windows over the 30-day reservation horizon are timed
+against the reservation index and against plain SQL, as are lot occupancy,
+spot-grid pages and spot lookups against the occupancy engine, the completed
+bookings are re-priced row by row and as one NumPy batch, nearest-lot
+searches over 10k synthetic lots are timed against a full scan, and reader
+threads load lot occupancy while writer threads book and release spots.
+The hot booking and spot lookups are timed, and their SQLite query plans
+shown, with their indexes and again with them dropped. A 10k-spot lot is
+created, grown, shrunk and deleted through the admin routes. Booking and
+releasing through BookingService from threads is compared with
+AsyncBookingService on one event loop, and a burst of gate entries and
+exits goes through the batch gate API and through the single-event
+routes. Once per run, the time and resident memory of a cold
+``import parkingManagement`` are taken.
+
+    python benchmark.py                        # small and medium, checked against the baseline
+    python benchmark.py --sizes small --save   # record the results as the new baseline
+    python benchmark.py --sizes xlarge         # the query plans over 1M bookings
+
+DB_PROFILE and OCCUPANCY_ENGINE are passed through, so profiles can be
+compared; the concurrent probe is where the tuned PRAGMAs and pool show.
+The run fails when a route got slower or hungrier than the baseline by
+more than ``--threshold`` or runs more statements, and when there is no
+baseline to compare with.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+SIZES = {
+    'small': {'users': 200, 'lots': 10, 'bookings': 10000, 'reservations': 5000},
+    'medium': {'users': 2000, 'lots': 50, 'bookings': 100000, 'reservations': 50000},
+    'large': {'users': 10000, 'lots': 200, 'bookings': 500000, 'reservations': 250000},
+    'xlarge': {'users': 20000, 'lots': 400, 'bookings': 1000000, 'reservations': 500000},
+}
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# (endpoint, client, method, url); release_spot and pay_release act on the booking book_now just made
+ROUTES = [
+    ('home_page', 'user', 'get', '/'),
+    ('admin_home_page', 'admin', 'get', '/admin_home'),
+    ('book_now', 'user', 'post', '/book_now'),
+    ('release_spot', 'user', 'post', '/release_spot/{booking_id}'),
+    ('pay_release', 'user', 'post', '/pay_release/{booking_id}'),
+    ('admin_user_summary', 'admin', 'get', '/admin/user_summary'),
+    ('user_summary', 'user', 'get', '/user/summary'),
+    ('admin_bookings_bar_chart', 'admin', 'get', '/admin/bookings_bar_chart'),
+    ('admin_revenue_per_lot_chart', 'admin', 'get', '/admin/revenue_per_lot_chart'),
+    ('user_bookings_over_time_chart', 'user', 'get', '/user/bookings_over_time_chart'),
+    ('user_spending_over_time_chart', 'user', 'get', '/user/spending_over_time_chart'),
+    ('api_bookings_per_user', 'admin', 'get', '/api/admin/bookings_per_user'),
+    ('api_revenue_per_lot', 'admin', 'get', '/api/admin/revenue_per_lot'),
+    ('api_revenue_per_day', 'admin', 'get', '/api/admin/revenue_per_day'),
+    ('api_user_monthly', 'user', 'get', '/api/user/monthly'),
+    ('api_reservation_availability', 'user', 'get', '/api/reservations/availability?start={start}&end={end}'),
+    ('api_nearest_lots', 'user', 'get', '/api/lots/nearest?lat=12.97&lng=77.59&k=10'),
+]
+# Random reservation windows probed over the horizon, for the availability index against plain SQL
+AVAILABILITY_PROBES = 2000
+# Occupancy counts, spot-grid pages and spot lookups, from the occupancy engine and from SQL
+OCCUPANCY_PROBES = 500
+# Nearest-lot searches, over this many lots of which about half are full
+NEAREST_PROBES = 2000
+NEAREST_LOTS = 10000
+# Threads of the concurrent probe, and the operations each runs
+CONCURRENT_READERS = 8
+CONCURRENT_WRITERS = 4
+CONCURRENT_OPERATIONS = 100
+# Runs of each hot lookup, with and without its index
+PLAN_REPEATS = 50
+# Concurrent clients of the sync and async booking services, and the book-and-release cycles each runs
+SERVICE_CLIENTS = 8
+SERVICE_CYCLES = 50
+# Entries, and then exits, of the gate burst, and how many events each batch request carries
+GATE_EVENTS = 200
+GATE_BATCH_SIZE = 100
+# Spots of the lot the provisioning probe creates, grows to and shrinks to, and how often it does so
+PROVISION_SPOTS = (10000, 15000, 5000)
+PROVISION_RUNS = 3
+# Cold imports of the app, each in a fresh interpreter
+IMPORT_RUNS = 5
+# Heavy modules a worker should only load on first use
+LAZY_MODULES = ('matplotlib', 'numpy')
+
+# Differences below these are noise whatever the threshold says
+MIN_LATENCY_MS = 1.0
+MIN_PROBE_US = 50
+MIN_PRICING_MS = 5
+MIN_PROVISION_MS = 20
+MIN_MEMORY_KIB = 256
+MIN_IMPORT_MS = 50
+MIN_RSS_MIB = 5
+
+
+def run_size(size, iterations, warmup=2):
+    """Seed a database of ``size`` and time every route; runs in the worker process."""
+    from sqlalchemy import event, func, select
+    from parkingManagement import app, db, bulk
+    from parkingManagement.modals import User, ParkingSpot, Booking
+
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        counts = bulk.generate(**SIZES[size])
+        user_id = db.session.scalar(select(func.min(User.id)))
+        # Book into the lot with the most free spots so the loop never runs out
+        lot_id = db.session.execute(
+            select(ParkingSpot.parking_lot_id).where(ParkingSpot.status == 'free')
+            .group_by(ParkingSpot.parking_lot_id).order_by(func.count().desc()).limit(1)
+        ).scalar()
+    seed_seconds = time.perf_counter() - started
+
+    clients = {'user': app.test_client(), 'admin': app.test_client()}
+    with clients['user'].session_transaction() as s:
+        s['_user_id'] = str(user_id)
+        s['_fresh'] = True
+    with clients['admin'].session_transaction() as s:
+        s['admin_logged_in'] = True
+    forms = {'book_now': {'lot_id': lot_id, 'vehicle_number': 'KA01BM0001', 'vehicle_brand': 'Honda',
+                          'vehicle_model': 'City'}}
+
+    queries = [0]
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.__setitem__(0, queries[0] + 1))
+
+    def request(endpoint, client, method, url, state):
+        queries[0] = 0
+        begin = time.perf_counter()
+        response = getattr(clients[client], method)(url.format(**state), data=forms.get(endpoint))
+        elapsed = time.perf_counter() - begin
+        if response.status_code >= 400:
+            raise RuntimeError(f'{endpoint} answered {response.status_code}')
+        if endpoint == 'book_now':
+            with app.app_context():
+                state['booking_id'] = db.session.scalar(
+                    select(func.max(Booking.id)).where(Booking.user_id == user_id, Booking.exit_time.is_(None)))
+        return elapsed, queries[0]
+
+    window = datetime.now().replace(second=0, microsecond=0) + timedelta(days=1)
+    state = {'start': window.isoformat(), 'end': (window + timedelta(hours=2)).isoformat()}
+    for _ in range(warmup):
+        for route in ROUTES:
+            request(*route, state)
+
+    peaks = {}
+    tracemalloc.start()
+    for route in ROUTES:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        request(*route, state)
+        peaks[route[0]] = (tracemalloc.get_traced_memory()[1] - before) / 1024
+    tracemalloc.stop()
+
+    samples = {route[0]: ([], []) for route in ROUTES}
+    for _ in range(iterations):
+        for route in ROUTES:
+            elapsed, statements = request(*route, state)
+            samples[route[0]][0].append(elapsed * 1000)
+            samples[route[0]][1].append(statements)
+
+    routes = {}
+    for endpoint, (latencies, statements) in samples.items():
+        cuts = statistics.quantiles(latencies, n=20, method='inclusive')
+        routes[endpoint] = {
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p95_ms': round(cuts[18], 3),
+            'queries': round(statistics.mean(statements), 2),
+            'peak_kib': round(peaks[endpoint], 1)
+        }
+    with app.app_context():
+        availability = probe_availability(db)
+        occupancy = probe_occupancy(db)
+        pricing = probe_pricing()
+    concurrent = probe_concurrent(app, db, lot_id)
+    provisioning = probe_provisioning(app, db, clients['admin'])
+    service_load = probe_service_load(app, db, lot_id)
+    gate = probe_gate(app, db, lot_id, user_id, clients)
+    # Last, since it drops the indexes for a while
+    with app.app_context():
+        query_plans = probe_query_plans(db)
+    return {'rows': counts, 'seed_seconds': round(seed_seconds, 2), 'iterations': iterations, 'routes': routes,
+            'availability': availability, 'occupancy': occupancy, 'pricing': pricing, 'nearest': probe_nearest(), 'concurrent': concurrent,
+            'provisioning': provisioning, 'service_load': service_load, 'gate': gate,
+            'query_plans': query_plans}
+
+
+def probe_availability(db, probes=AVAILABILITY_PROBES, seed=7):
+    """Time free-spot counts for random windows in the reservation horizon, index against SQL."""
+    import random
+    from sqlalchemy import func, select
+    from parkingManagement.modals import ParkingLot, ParkingSpot, Reservation
+    from parkingManagement.reservations import reservation_index, align, HORIZON_DAYS, MAX_RESERVATION_HOURS
+
+    rng = random.Random(seed)
+    lot_ids = db.session.scalars(select(ParkingLot.id)).all()
+    now = datetime.now()
+    windows = []
+    for _ in range(probes):
+        start = now + timedelta(minutes=rng.randrange(HORIZON_DAYS * 24 * 60))
+        windows.append((rng.choice(lot_ids), *align(start, start + timedelta(
+            minutes=rng.randrange(15, MAX_RESERVATION_HOURS * 60)))))
+
+    def sql_count(lot_id, start, end):
+        reserved = select(Reservation.spot_id).where(
+            Reservation.lot_id == lot_id, Reservation.status != 'cancelled',
+            Reservation.start_time < end, Reservation.end_time > start)
+        return db.session.scalar(select(func.count()).select_from(ParkingSpot).where(
+            ParkingSpot.parking_lot_id == lot_id, ParkingSpot.id.not_in(reserved)))
+
+    reservation_index.invalidate()
+    started = time.perf_counter()
+    reservation_index.free_by_lot(lot_ids, now, now + timedelta(hours=1))
+    load_ms = (time.perf_counter() - started) * 1000
+
+    timings = {}
+    answers = {}
+    for name, count in (('index', reservation_index.free_count), ('sql', sql_count)):
+        latencies = []
+        answers[name] = []
+        for window in windows:
+            begin = time.perf_counter()
+            answers[name].append(count(*window))
+            latencies.append((time.perf_counter() - begin) * 1e6)
+        cuts = statistics.quantiles(latencies, n=20, method='inclusive')
+        timings[name] = {'p50_us': round(statistics.median(latencies), 1), 'p95_us': round(cuts[18], 1)}
+    if answers['index'] != answers['sql']:
+        raise RuntimeError('The availability index disagrees with the reservation table.')
+    return {'probes': probes, 'index_load_ms': round(load_ms, 1), **timings}
+
+
+def probe_occupancy(db, probes=OCCUPANCY_PROBES, seed=17):
+    """Time lot occupancy, spot-grid pages and spot lookups, occupancy engine against SQL."""
+    import random
+    from sqlalchemy import func, select
+    from parkingManagement.controllers import SPOT_GRID_PAGE_SIZE
+    from parkingManagement.modals import ParkingSpot
+    from parkingManagement.occupancy import OccupancyEngine, occupancy_engine
+
+    rng = random.Random(seed)
+    totals = dict(db.session.execute(select(ParkingSpot.parking_lot_id, func.count())
+                                     .group_by(ParkingSpot.parking_lot_id)).all())
+    max_spot = db.session.scalar(select(func.max(ParkingSpot.id)))
+    pages = [(lot_id, rng.randrange(totals[lot_id]), SPOT_GRID_PAGE_SIZE)
+             for lot_id in rng.choices(list(totals), k=probes)]
+    # A few ids past the last spot, so misses are timed too
+    spot_ids = [rng.randint(1, max_spot + max_spot // 100 + 1) for _ in range(probes)]
+
+    def sql_occupied():
+        return dict(db.session.execute(select(ParkingSpot.parking_lot_id, func.count(ParkingSpot.id))
+                                       .where(ParkingSpot.status == 'occupied')
+                                       .group_by(ParkingSpot.parking_lot_id)).all())
+
+    def sql_grid(lot_id, offset, limit):
+        total = db.session.scalar(select(func.count(ParkingSpot.id)).where(ParkingSpot.parking_lot_id == lot_id))
+        rows = db.session.execute(select(ParkingSpot.id, ParkingSpot.status)
+                                  .where(ParkingSpot.parking_lot_id == lot_id)
+                                  .order_by(ParkingSpot.id).offset(offset).limit(limit)).all()
+        return total, [spot_id for spot_id, _ in rows], ''.join('1' if status == 'occupied' else '0'
+                                                                for _, status in rows)
+
+    def sql_spot_status(spot_id):
+        row = db.session.execute(select(ParkingSpot.parking_lot_id, ParkingSpot.status)
+                                 .where(ParkingSpot.id == spot_id)).first()
+        return tuple(row) if row else None
+
+    if occupancy_engine.enabled:
+        # Statuses the running engine has not written yet would read as disagreement
+        occupancy_engine.flush()
+    # A fresh engine, so its load is timed and the app's own stays as it was
+    engine = OccupancyEngine()
+    started = time.perf_counter()
+    engine.ensure_loaded()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    lookups = {
+        'occupied_by_lot': ([()] * probes, engine.occupied_by_lot, sql_occupied),
+        'grid': (pages, engine.grid, sql_grid),
+        'spot_status': ([(spot_id,) for spot_id in spot_ids], engine.spot_status, sql_spot_status),
+    }
+    result = {'probes': probes, 'load_ms': round(load_ms, 1)}
+    for lookup, (calls, from_engine, from_sql) in lookups.items():
+        timings = {}
+        answers = {}
+        for name, run in (('engine', from_engine), ('sql', from_sql)):
+            latencies = []
+            answers[name] = []
+            for args in calls:
+                begin = time.perf_counter()
+                answers[name].append(run(*args))
+                latencies.append((time.perf_counter() - begin) * 1e6)
+            cuts = statistics.quantiles(latencies, n=20, method='inclusive')
+            timings[name] = {'p50_us': round(statistics.median(latencies), 1), 'p95_us': round(cuts[18], 1)}
+        if answers['engine'] != answers['sql']:
+            raise RuntimeError(f'The occupancy engine disagrees with the spot table on {lookup}.')
+        result[lookup] = timings
+    return result
+
+
+def probe_pricing():
+    """Quote every completed booking under a peak/cap/grace tariff, one by one and as a batch."""
+    import numpy as np
+    from parkingManagement import pricing
+
+    lot_ids, entry_times, exit_times = [np.concatenate(parts) for parts in
+                                        list(zip(*pricing.completed_bookings()))[:3]]
+    schedules = {lot_id: schedule.replace(peak_rate=schedule.base_rate * 1.5, peak_start=8, peak_end=20,
+                                          daily_cap=schedule.base_rate * 10, grace_minutes=10)
+                 for lot_id, schedule in pricing.lot_schedules().items()}
+
+    started = time.perf_counter()
+    entries, exits = entry_times.tolist(), exit_times.tolist()
+    single = [schedules[lot_id].quote(entry, exit) for lot_id, entry, exit in zip(lot_ids.tolist(), entries, exits)]
+    single_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    batch = pricing.quote_batch(schedules, lot_ids, entry_times, exit_times)
+    batch_ms = (time.perf_counter() - started) * 1000
+    if not np.allclose(single, batch):
+        raise RuntimeError('The batch quote disagrees with the single quote.')
+    return {'bookings': len(lot_ids), 'single_ms': round(single_ms, 1), 'batch_ms': round(batch_ms, 1)}
+
+
+def probe_nearest(probes=NEAREST_PROBES, lots=NEAREST_LOTS, k=10, seed=11):
+    """Time k-nearest searches for lots with free spots, KD-tree against a scan of every lot."""
+    import math
+    import random
+    from parkingManagement.locator import LotTree, KM_PER_DEGREE
+
+    rng = random.Random(seed)
+    centres = [(rng.uniform(12.85, 13.10), rng.uniform(77.48, 77.75)) for _ in range(100)]
+    rows = []
+    for lot_id in range(1, lots + 1):
+        latitude, longitude = rng.choice(centres)
+        rows.append((lot_id, '', '', '', 50.0, rng.randint(20, 380),
+                     latitude + rng.gauss(0, 0.01), longitude + rng.gauss(0, 0.01)))
+    occupied = {row[0]: row[5] if rng.random() < 0.5 else rng.randrange(row[5]) for row in rows}
+    started = time.perf_counter()
+    tree = LotTree(rows)
+    build_ms = (time.perf_counter() - started) * 1000
+    points = [(rng.uniform(12.8, 13.15), rng.uniform(77.4, 77.8)) for _ in range(probes)]
+
+    def scan(latitude, longitude):
+        qx, qy = longitude * tree.scale, latitude * KM_PER_DEGREE
+        return sorted(math.hypot(x - qx, y - qy) for (x, y), row in zip(tree.points, rows)
+                      if row[5] > occupied[row[0]])[:k]
+
+    timings = {}
+    answers = {}
+    for name, search in (('tree', lambda *point: [found[0] for found in tree.nearest(*point, k, occupied)]),
+                         ('scan', scan)):
+        latencies = []
+        answers[name] = []
+        for point in points:
+            begin = time.perf_counter()
+            answers[name].append(search(*point))
+            latencies.append((time.perf_counter() - begin) * 1e6)
+        cuts = statistics.quantiles(latencies, n=20, method='inclusive')
+        timings[name] = {'p50_us': round(statistics.median(latencies), 1), 'p95_us': round(cuts[18], 1)}
+    rounded = {name: [[round(distance, 9) for distance in found] for found in answers[name]] for name in answers}
+    if rounded['tree'] != rounded['scan']:
+        raise RuntimeError('The nearest-lot index disagrees with a full scan.')
+    return {'probes': probes, 'lots': lots, 'k': k, 'build_ms': round(build_ms, 1), **timings}
+
+
+def probe_concurrent(app, db, lot_id, readers=CONCURRENT_READERS, writers=CONCURRENT_WRITERS,
+                     operations=CONCURRENT_OPERATIONS):
+    """Load lot occupancy from reader threads while writer threads book and release spots in ``lot_id``."""
+    import threading
+    from sqlalchemy import func, select
+    from sqlalchemy.exc import OperationalError
+    from parkingManagement.modals import User, ParkingLot, ParkingSpot
+    from parkingManagement.services import booking_service, BookingError
+
+    with app.app_context():
+        user_ids = db.session.scalars(select(User.id).order_by(User.id).limit(writers)).all()
+    occupancy = select(ParkingLot.id, func.count(ParkingSpot.id)).outerjoin(
+        ParkingSpot, (ParkingSpot.parking_lot_id == ParkingLot.id) & (ParkingSpot.status == 'occupied')
+    ).group_by(ParkingLot.id)
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(readers + writers)
+
+    def timed(kind, operation):
+        begin = time.perf_counter()
+        try:
+            operation()
+        except (BookingError, OperationalError):
+            with lock:
+                errors[kind] += 1
+            return
+        elapsed = (time.perf_counter() - begin) * 1000
+        with lock:
+            latencies[kind].append(elapsed)
+
+    def read():
+        with app.app_context():
+            barrier.wait()
+            for _ in range(operations):
+                timed('read', lambda: db.session.execute(occupancy).all())
+
+    def write(user_id, number):
+        def book_and_release():
+            booking = booking_service.allocate(user_id, lot_id, f'KA99BM{number:04d}', 'Honda', 'City')
+            booking_service.release(booking.id, user_id)
+
+        with app.app_context():
+            barrier.wait()
+            for _ in range(operations):
+                timed('write', book_and_release)
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    threads += [threading.Thread(target=write, args=(user_ids[i % len(user_ids)], i)) for i in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    result = {'readers': readers, 'writers': writers, 'seconds': round(seconds, 2)}
+    for kind, samples in latencies.items():
+        cuts = statistics.quantiles(samples, n=20, method='inclusive') if len(samples) > 1 else samples * 19
+        result[kind] = {'per_second': round(len(samples) / seconds, 1),
+                        'p50_ms': round(statistics.median(samples), 3) if samples else None,
+                        'p95_ms': round(cuts[18], 3) if samples else None,
+                        'errors': errors[kind]}
+    return result
+
+
+def probe_service_load(app, db, lot_id, clients=SERVICE_CLIENTS, cycles=SERVICE_CYCLES):
+    """Book and release spots in ``lot_id`` from concurrent clients, sync service on threads against async on a loop."""
+    import asyncio
+    import threading
+    from sqlalchemy import select
+    from sqlalchemy.exc import SQLAlchemyError
+    from parkingManagement.modals import User
+    from parkingManagement.occupancy import occupancy_engine
+    from parkingManagement.services import booking_service, AsyncBookingService, BookingError
+
+    with app.app_context():
+        user_ids = db.session.scalars(select(User.id).order_by(User.id).limit(clients)).all()
+
+    def summary(latencies, errors, seconds):
+        cuts = statistics.quantiles(latencies, n=20, method='inclusive') if len(latencies) > 1 else latencies * 19
+        return {'cycles_per_second': round(len(latencies) / seconds, 1),
+                'p50_ms': round(statistics.median(latencies), 3) if latencies else None,
+                'p95_ms': round(cuts[18], 3) if latencies else None, 'errors': errors}
+
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def sync_client(user_id, number):
+        with app.app_context():
+            for _ in range(cycles):
+                begin = time.perf_counter()
+                try:
+                    booking = booking_service.allocate(user_id, lot_id, f'KA98BM{number:04d}', 'Honda', 'City')
+                    booking_service.release(booking.id, user_id)
+                except (BookingError, SQLAlchemyError):
+                    with lock:
+                        errors[0] += 1
+                    continue
+                with lock:
+                    latencies.append((time.perf_counter() - begin) * 1000)
+
+    threads = [threading.Thread(target=sync_client, args=(user_ids[i % len(user_ids)], i)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result = {'clients': clients, 'cycles': cycles,
+              'sync': summary(latencies, errors[0], time.perf_counter() - started)}
+
+    # The async service claims spots without the occupancy engine's lock, so it cannot run next to it
+    if occupancy_engine.enabled:
+        result['async'] = None
+        return result
+
+    async def run_async():
+        service = AsyncBookingService()
+        async_latencies, async_errors = [], [0]
+
+        async def client(user_id, number):
+            for _ in range(cycles):
+                begin = time.perf_counter()
+                try:
+                    booking = await service.allocate(user_id, lot_id, f'KA97BM{number:04d}', 'Honda', 'City')
+                    await service.release(booking.id, user_id)
+                except (BookingError, SQLAlchemyError):
+                    async_errors[0] += 1
+                    continue
+                async_latencies.append((time.perf_counter() - begin) * 1000)
+
+        begin = time.perf_counter()
+        await asyncio.gather(*(client(user_ids[i % len(user_ids)], i) for i in range(clients)))
+        seconds = time.perf_counter() - begin
+        await service.dispose()
+        return summary(async_latencies, async_errors[0], seconds)
+
+    result['async'] = asyncio.run(run_async())
+    return result
+
+
+def probe_gate(app, db, lot_id, user_id, clients, events=GATE_EVENTS, batch_size=GATE_BATCH_SIZE):
+    """Park ``events`` cars in ``lot_id`` and let them out again, per event against in gate batches."""
+    from sqlalchemy import func, select
+    from parkingManagement.modals import ParkingSpot, Booking
+
+    with app.app_context():
+        free = db.session.scalar(select(func.count()).select_from(ParkingSpot).where(
+            ParkingSpot.parking_lot_id == lot_id, ParkingSpot.status == 'free'))
+    events = min(events, free)
+    vehicle = {'vehicle_brand': 'Honda', 'vehicle_model': 'City'}
+
+    def open_bookings(prefix):
+        with app.app_context():
+            return db.session.scalars(select(Booking.id).where(
+                Booking.vehicle_number.like(prefix + '%'), Booking.exit_time.is_(None))).all()
+
+    def post(client, url, **kwargs):
+        response = clients[client].post(url, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url} answered {response.status_code}')
+        return response
+
+    started = time.perf_counter()
+    for number in range(events):
+        post('user', '/book_now', data={'lot_id': lot_id, 'vehicle_number': f'KA96BM{number:04d}', **vehicle})
+    booking_ids = open_bookings('KA96BM')
+    for booking_id in booking_ids:
+        post('user', f'/pay_release/{booking_id}')
+    single_seconds = time.perf_counter() - started
+
+    entries = [{'user_id': user_id, 'lot_id': lot_id, 'vehicle_number': f'KA95BM{number:04d}', **vehicle}
+               for number in range(events)]
+    failed = 0
+    started = time.perf_counter()
+    for first in range(0, events, batch_size):
+        answer = post('admin', '/api/gate/batch', json={'entries': entries[first:first + batch_size]}).get_json()
+        failed += sum(not item['ok'] for item in answer['entries'])
+    exits = [{'booking_id': booking_id} for booking_id in open_bookings('KA95BM')]
+    for first in range(0, len(exits), batch_size):
+        answer = post('admin', '/api/gate/batch', json={'exits': exits[first:first + batch_size]}).get_json()
+        failed += sum(not item['ok'] for item in answer['exits'])
+    batch_seconds = time.perf_counter() - started
+
+    if len(booking_ids) != events or len(exits) != events or failed or open_bookings('KA96BM') \
+            or open_bookings('KA95BM'):
+        raise RuntimeError('Not every gate event went through.')
+    return {'events': events * 2, 'batch_size': batch_size,
+            'single_per_second': round(events * 2 / single_seconds, 1),
+            'batch_per_second': round(events * 2 / batch_seconds, 1)}
+
+
+def probe_provisioning(app, db, admin, spots=PROVISION_SPOTS, runs=PROVISION_RUNS):
+    """Create a lot of ``spots[0]`` spots, resize it to each further count and delete it, via the admin routes."""
+    from sqlalchemy import func, select
+    from parkingManagement.modals import ParkingLot, ParkingSpot
+
+    def spot_count(lot_id):
+        with app.app_context():
+            return db.session.scalar(select(func.count()).select_from(ParkingSpot)
+                                     .where(ParkingSpot.parking_lot_id == lot_id))
+
+    def timed(url, data):
+        begin = time.perf_counter()
+        response = admin.post(url, data=data)
+        elapsed = (time.perf_counter() - begin) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url} answered {response.status_code}')
+        return elapsed
+
+    steps = {'create': [], **{f'resize_{count}': [] for count in spots[1:]}, 'delete': []}
+    for _ in range(runs):
+        steps['create'].append(timed('/admin_home', {'prime_location': 'Benchmark Garage', 'address': '1 Bench Road',
+                                                     'pincode': '560001', 'price_per_hour': 40,
+                                                     'max_spots': spots[0]}))
+        with app.app_context():
+            lot_id = db.session.scalar(select(func.max(ParkingLot.id)))
+        for count in spots[1:]:
+            steps[f'resize_{count}'].append(timed('/edit_lot', {'lot_id': lot_id, 'price_per_hour': 40,
+                                                                'max_spots': count}))
+            if spot_count(lot_id) != count:
+                raise RuntimeError(f'Resizing lot {lot_id} to {count} spots left {spot_count(lot_id)}.')
+        steps['delete'].append(timed('/delete_lot', {'lot_id': lot_id}))
+        if spot_count(lot_id):
+            raise RuntimeError(f'Deleting lot {lot_id} left spots behind.')
+    return {'spots': list(spots), 'runs': runs,
+            **{step: round(statistics.median(latencies), 1) for step, latencies in steps.items()}}
+
+
+def probe_query_plans(db, repeats=PLAN_REPEATS, seed=13):
+    """Time the hot booking and spot lookups and record their plans, with their indexes and without."""
+    import random
+    from sqlalchemy import func, select
+    from parkingManagement.modals import User, ParkingLot, ParkingSpot, Booking
+
+    rng = random.Random(seed)
+    user_ids = db.session.scalars(select(User.id)).all()
+    lot_ids = db.session.scalars(select(ParkingLot.id)).all()
+    max_spot = db.session.scalar(select(func.max(ParkingSpot.id)))
+    lookups = {
+        'user_bookings': lambda: select(Booking.id).where(Booking.user_id == rng.choice(user_ids))
+        .order_by(Booking.entry_time.desc()).limit(20),
+        'active_booking': lambda: select(Booking.id).where(Booking.spot_id == rng.randint(1, max_spot),
+                                                           Booking.exit_time.is_(None)),
+        'free_spots': lambda: select(ParkingSpot.id).where(ParkingSpot.parking_lot_id == rng.choice(lot_ids),
+                                                           ParkingSpot.status == 'free').limit(64),
+        'recent_bookings': lambda: select(Booking.id).order_by(Booking.entry_time.desc()).limit(50),
+    }
+    indexes = [index for model in (ParkingSpot, Booking) for index in model.__table__.indexes]
+
+    def measure():
+        measured = {}
+        for name, lookup in lookups.items():
+            sql = str(lookup().compile(db.engine, compile_kwargs={'literal_binds': True}))
+            plan = [row[3] for row in db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+            latencies = []
+            for _ in range(repeats):
+                statement = lookup()
+                begin = time.perf_counter()
+                db.session.execute(statement).all()
+                latencies.append((time.perf_counter() - begin) * 1000)
+            measured[name] = {'p50_ms': round(statistics.median(latencies), 3), 'plan': '; '.join(plan)}
+        db.session.commit()
+        return measured
+
+    def alter(ddl):
+        with db.engine.begin() as connection:
+            for index in indexes:
+                getattr(index, ddl)(connection)
+        # Pooled SQLite connections can go on trusting the schema they parsed before
+        db.session.close()
+        db.engine.dispose()
+
+    indexed = measure()
+    alter('drop')
+    try:
+        unindexed = measure()
+    finally:
+        alter('create')
+    return {'repeats': repeats, 'indexed': indexed, 'unindexed': unindexed}
+
+
+IMPORT_SCRIPT = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import parkingManagement
+seconds = time.perf_counter() - started
+# ru_maxrss is in KiB on Linux
+print(json.dumps({'import_ms': seconds * 1000, 'rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  'loaded': [name for name in sys.argv[1:] if name in sys.modules]}))
+'''
+
+
+def probe_startup(runs=IMPORT_RUNS):
+    """Time ``import parkingManagement`` in fresh interpreters and take their peak resident memory."""
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(tmp, 'startup.db'))
+        for _ in range(runs):
+            done = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT, *LAZY_MODULES], env=env,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, check=True)
+            samples.append(json.loads(done.stdout.decode().strip().splitlines()[-1]))
+    return {'runs': runs,
+            'import_ms': round(statistics.median(sample['import_ms'] for sample in samples), 1),
+            'rss_mib': round(statistics.median(sample['rss_mib'] for sample in samples), 1),
+            'loaded': samples[0]['loaded']}
+
+
+def run_worker(size, iterations):
+    # A throwaway database per size; DATABASE_URL must be set before the app is imported
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(tmp, 'benchmark.db'))
+        done = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', size,
+                               '--iterations', str(iterations)], env=env, stdout=subprocess.PIPE)
+    if done.returncode:
+        raise SystemExit(f'Benchmark of size {size} failed.')
+    return json.loads(done.stdout.decode().strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """Return a description of every regression against ``baseline``."""
+    regressions = []
+    startup, base_startup = results.get('startup'), baseline.get('startup')
+    if startup and base_startup:
+        current, base = startup['import_ms'], base_startup['import_ms']
+        if current > base * (1 + threshold) and current - base > MIN_IMPORT_MS:
+            regressions.append(f'import parkingManagement: {base} -> {current} ms')
+        current, base = startup['rss_mib'], base_startup['rss_mib']
+        if current > base * (1 + threshold) and current - base > MIN_RSS_MIB:
+            regressions.append(f'import parkingManagement: RSS {base} -> {current} MiB')
+        for name in set(startup['loaded']) - set(base_startup['loaded']):
+            regressions.append(f'import parkingManagement now loads {name}')
+    for size, result in results['sizes'].items():
+        base_routes = baseline.get('sizes', {}).get(size, {}).get('routes', {})
+        for endpoint, current in result['routes'].items():
+            base = base_routes.get(endpoint)
+            if base is None:
+                continue
+            if current['p95_ms'] > base['p95_ms'] * (1 + threshold) and \
+                    current['p95_ms'] - base['p95_ms'] > MIN_LATENCY_MS:
+                regressions.append(f'{size} {endpoint}: p95 {base["p95_ms"]} -> {current["p95_ms"]} ms')
+            if current['queries'] > base['queries'] + 0.5:
+                regressions.append(f'{size} {endpoint}: queries {base["queries"]} -> {current["queries"]}')
+            if current['peak_kib'] > base['peak_kib'] * (1 + threshold) and \
+                    current['peak_kib'] - base['peak_kib'] > MIN_MEMORY_KIB:
+                regressions.append(f'{size} {endpoint}: peak {base["peak_kib"]} -> {current["peak_kib"]} KiB')
+        probes = result.get('availability')
+        base_probes = baseline.get('sizes', {}).get(size, {}).get('availability')
+        if probes and base_probes:
+            current, base = probes['index']['p95_us'], base_probes['index']['p95_us']
+            if current > base * (1 + threshold) and current - base > MIN_PROBE_US:
+                regressions.append(f'{size} availability index: p95 {base} -> {current} us')
+        occupancy = result.get('occupancy')
+        base_occupancy = baseline.get('sizes', {}).get(size, {}).get('occupancy')
+        if occupancy and base_occupancy:
+            for lookup in ('occupied_by_lot', 'grid', 'spot_status'):
+                current, base = occupancy[lookup]['engine']['p95_us'], base_occupancy[lookup]['engine']['p95_us']
+                if current > base * (1 + threshold) and current - base > MIN_PROBE_US:
+                    regressions.append(f'{size} occupancy engine {lookup}: p95 {base} -> {current} us')
+        pricing = result.get('pricing')
+        base_pricing = baseline.get('sizes', {}).get(size, {}).get('pricing')
+        if pricing and base_pricing:
+            current, base = pricing['batch_ms'], base_pricing['batch_ms']
+            if current > base * (1 + threshold) and current - base > MIN_PRICING_MS:
+                regressions.append(f'{size} batch pricing: {base} -> {current} ms')
+        nearest = result.get('nearest')
+        base_nearest = baseline.get('sizes', {}).get(size, {}).get('nearest')
+        if nearest and base_nearest:
+            current, base = nearest['tree']['p95_us'], base_nearest['tree']['p95_us']
+            if current > base * (1 + threshold) and current - base > MIN_PROBE_US:
+                regressions.append(f'{size} nearest lots: p95 {base} -> {current} us')
+        concurrent = result.get('concurrent')
+        base_concurrent = baseline.get('sizes', {}).get(size, {}).get('concurrent')
+        if concurrent and base_concurrent:
+            for kind in ('read', 'write'):
+                current, base = concurrent[kind], base_concurrent[kind]
+                if current['errors'] > base['errors']:
+                    regressions.append(f'{size} concurrent {kind}s: errors {base["errors"]} -> {current["errors"]}')
+                if current['p95_ms'] is not None and base['p95_ms'] is not None and \
+                        current['p95_ms'] > base['p95_ms'] * (1 + threshold) and \
+                        current['p95_ms'] - base['p95_ms'] > MIN_LATENCY_MS:
+                    regressions.append(f'{size} concurrent {kind}s: p95 {base["p95_ms"]} -> {current["p95_ms"]} ms')
+        provisioning = result.get('provisioning')
+        base_provisioning = baseline.get('sizes', {}).get(size, {}).get('provisioning')
+        if provisioning and base_provisioning and provisioning['spots'] == base_provisioning['spots']:
+            for step, current in provisioning.items():
+                base = base_provisioning.get(step)
+                if step in ('spots', 'runs') or base is None:
+                    continue
+                if current > base * (1 + threshold) and current - base > MIN_PROVISION_MS:
+                    regressions.append(f'{size} lot {step}: {base} -> {current} ms')
+        service_load = result.get('service_load')
+        base_service_load = baseline.get('sizes', {}).get(size, {}).get('service_load')
+        if service_load and base_service_load:
+            for flavour in ('sync', 'async'):
+                current, base = service_load[flavour], base_service_load[flavour]
+                if not current or not base:
+                    continue
+                if current['cycles_per_second'] < base['cycles_per_second'] / (1 + threshold):
+                    regressions.append(f'{size} {flavour} service: {base["cycles_per_second"]} -> '
+                                       f'{current["cycles_per_second"]} cycles/s')
+                if current['errors'] > base['errors']:
+                    regressions.append(f'{size} {flavour} service: errors {base["errors"]} -> {current["errors"]}')
+        gate = result.get('gate')
+        base_gate = baseline.get('sizes', {}).get(size, {}).get('gate')
+        if gate and base_gate and gate['batch_per_second'] < base_gate['batch_per_second'] / (1 + threshold):
+            regressions.append(f'{size} gate batches: {base_gate["batch_per_second"]} -> '
+                               f'{gate["batch_per_second"]} events/s')
+        plans = result.get('query_plans')
+        base_plans = baseline.get('sizes', {}).get(size, {}).get('query_plans')
+        if plans and base_plans:
+            for name, current in plans['indexed'].items():
+                base = base_plans['indexed'].get(name)
+                if base and current['plan'] != base['plan']:
+                    regressions.append(f'{size} {name}: plan changed to {current["plan"]}')
+    return regressions
+
+
+def report(results):
+    startup = results['startup']
+    print(f'import parkingManagement: {startup["import_ms"]} ms, {startup["rss_mib"]} MiB RSS '
+          f'(median of {startup["runs"]}), loading {", ".join(startup["loaded"]) or "none"} of '
+          f'{", ".join(LAZY_MODULES)}')
+    for size, result in results['sizes'].items():
+        rows = result['rows']
+        print(f'\n{size}: {rows["users"]} users, {rows["lots"]} lots, {rows["bookings"]} bookings, '
+              f'{rows["reservations"]} reservations')
+        print(f'  seeded in {result["seed_seconds"]} s, {result["iterations"]} iterations')
+        print(f'  {"endpoint":32} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"peak KiB":>9}')
+        for endpoint, r in result['routes'].items():
+            print(f'  {endpoint:32} {r["p50_ms"]:9.2f} {r["p95_ms"]:9.2f} {r["queries"]:8.1f} {r["peak_kib"]:9.1f}')
+        probes = result['availability']
+        print(f'  availability over {probes["probes"]} windows in the horizon (index loaded in '
+              f'{probes["index_load_ms"]} ms): index p50 {probes["index"]["p50_us"]} us, '
+              f'p95 {probes["index"]["p95_us"]} us; SQL p50 {probes["sql"]["p50_us"]} us, '
+              f'p95 {probes["sql"]["p95_us"]} us')
+        occupancy = result['occupancy']
+        print(f'  occupancy over {occupancy["probes"]} lookups each (engine loaded in {occupancy["load_ms"]} ms):')
+        for lookup in ('occupied_by_lot', 'grid', 'spot_status'):
+            engine, sql = occupancy[lookup]['engine'], occupancy[lookup]['sql']
+            print(f'    {lookup:16} engine p50 {engine["p50_us"]} us, p95 {engine["p95_us"]} us; '
+                  f'SQL p50 {sql["p50_us"]} us, p95 {sql["p95_us"]} us')
+        pricing = result['pricing']
+        speedup = pricing['single_ms'] / pricing['batch_ms'] if pricing['batch_ms'] else float('inf')
+        print(f'  pricing {pricing["bookings"]} completed bookings: single {pricing["single_ms"]} ms, '
+              f'batch {pricing["batch_ms"]} ms ({speedup:.0f}x)')
+        nearest = result['nearest']
+        print(f'  {nearest["k"]} nearest of {nearest["lots"]} lots over {nearest["probes"]} searches (tree built in '
+              f'{nearest["build_ms"]} ms): tree p50 {nearest["tree"]["p50_us"]} us, '
+              f'p95 {nearest["tree"]["p95_us"]} us; scan p50 {nearest["scan"]["p50_us"]} us, '
+              f'p95 {nearest["scan"]["p95_us"]} us')
+        provisioning = result['provisioning']
+        steps = [f'{step} {ms} ms' for step, ms in provisioning.items() if step not in ('spots', 'runs')]
+        print(f'  {provisioning["spots"][0]}-spot lot, median of {provisioning["runs"]}: {", ".join(steps)}')
+        service_load = result['service_load']
+        print(f'  {service_load["clients"]} clients booking and releasing {service_load["cycles"]} times each:')
+        for flavour in ('sync', 'async'):
+            r = service_load[flavour]
+            if r is None:
+                print(f'    {flavour:5} skipped with the occupancy engine on')
+                continue
+            print(f'    {flavour:5} {r["cycles_per_second"]} cycles/s, p50 {r["p50_ms"]} ms, p95 {r["p95_ms"]} ms, '
+                  f'{r["errors"]} failed')
+        gate = result['gate']
+        print(f'  {gate["events"]} gate events: {gate["single_per_second"]}/s one request each, '
+              f'{gate["batch_per_second"]}/s in batches of {gate["batch_size"]}')
+        plans = result['query_plans']
+        print(f'  hot lookups, p50 of {plans["repeats"]} runs with and without their indexes:')
+        for name, indexed in plans['indexed'].items():
+            unindexed = plans['unindexed'][name]
+            print(f'    {name:16} {indexed["p50_ms"]:9.3f} ms  {indexed["plan"]}')
+            print(f'    {"":16} {unindexed["p50_ms"]:9.3f} ms  {unindexed["plan"]}')
+        concurrent = result['concurrent']
+        print(f'  {concurrent["readers"]} readers and {concurrent["writers"]} writers for {concurrent["seconds"]} s:')
+        for kind in ('read', 'write'):
+            r = concurrent[kind]
+            print(f'    {kind}s {r["per_second"]}/s, p50 {r["p50_ms"]} ms, p95 {r["p95_ms"]} ms, '
+                  f'{r["errors"]} failed')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the routes against seeded databases.')
+    parser.add_argument('--sizes', default='small,medium', help=f'comma-separated, from {", ".join(SIZES)}')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative slowdown, e.g. 0.25')
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_size(args.worker, args.iterations)))
+        return
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f'unknown size {", ".join(unknown)}')
+
+    results = {
+        'config': {'DB_PROFILE': os.environ.get('DB_PROFILE', 'default'),
+                   'OCCUPANCY_ENGINE': os.environ.get('OCCUPANCY_ENGINE') == '1'},
+        'startup': probe_startup(),
+        'sizes': {size: run_worker(size, args.iterations) for size in sizes}
+    }
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save:
+        # Sizes not rerun keep their previous baseline
+        baseline = {'sizes': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline['config'] = results['config']
+        baseline['startup'] = results['startup']
+        baseline['sizes'].update(results['sizes'])
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f'\nBaseline written to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        # Nothing to compare against is a failed check, not a passed one
+        sys.exit(f'\nNo baseline at {args.baseline}; record one on this machine with --save.')
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != results['config']:
+        print(f'\nNote: the baseline was recorded with {baseline.get("config")}')
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:')
+        for line in regressions:
+            print('  ' + line)
+        sys.exit(1)
+    print('\nNo regressions against the baseline.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""add booking and parking spot lookup indexes
+
+Revision ID: 3f1c2a9d7e41
+Revises: d5cbd28d6f10
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7e41'
+down_revision = 'd5cbd28d6f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() already have these indexes
+    op.create_index('ix_parking_spot_lot_status', 'parking_spot', ['parking_lot_id', 'status'], if_not_exists=True)
+    op.create_index('ix_booking_user_entry', 'booking', ['user_id', 'entry_time'], if_not_exists=True)
+    op.create_index('ix_booking_spot_exit', 'booking', ['spot_id', 'exit_time'], if_not_exists=True)
+    op.create_index('ix_booking_entry_time', 'booking', ['entry_time'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_booking_entry_time', table_name='booking', if_exists=True)
+    op.drop_index('ix_booking_spot_exit', table_name='booking', if_exists=True)
+    op.drop_index('ix_booking_user_entry', table_name='booking', if_exists=True)
+    op.drop_index('ix_parking_spot_lot_status', table_name='parking_spot', if_exists=True)
@@ -0,0 +1,28 @@
+"""add parking lot coordinates
+
+Revision ID: a6d08c5e3b17
+Revises: e91b3f6a7c20
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d08c5e3b17'
+down_revision = 'e91b3f6a7c20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lot') as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lot') as batch_op:
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,48 @@
+"""add advance reservations
+
+Revision ID: c47e1d9a2b58
+Revises: 8b2e6f4c1a93
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e1d9a2b58'
+down_revision = '8b2e6f4c1a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reservation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('lot_id', sa.Integer(), nullable=False),
+        sa.Column('spot_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('vehicle_number', sa.String(length=20), nullable=False),
+        sa.Column('vehicle_brand', sa.String(length=30), nullable=False),
+        sa.Column('vehicle_model', sa.String(length=30), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ),
+        sa.ForeignKeyConstraint(['lot_id'], ['parking_lot.id'], ),
+        sa.ForeignKeyConstraint(['spot_id'], ['parking_spot.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_reservation_lot_end', 'reservation', ['lot_id', 'end_time'], if_not_exists=True)
+    op.create_index('ix_reservation_spot_start', 'reservation', ['spot_id', 'start_time'], if_not_exists=True)
+    op.create_index('ix_reservation_user_start', 'reservation', ['user_id', 'start_time'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_reservation_user_start', table_name='reservation')
+    op.drop_index('ix_reservation_spot_start', table_name='reservation')
+    op.drop_index('ix_reservation_lot_end', table_name='reservation')
+    op.drop_table('reservation')
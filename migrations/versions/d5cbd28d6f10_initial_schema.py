@@ -0,0 +1,74 @@
+"""initial schema
+
+Revision ID: d5cbd28d6f10
+Revises:
+Create Date: 2025-07-01 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5cbd28d6f10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing databases were created with db.create_all() and stamped at this revision
+    op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=30), nullable=False),
+        sa.Column('emailId', sa.String(length=50), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('address', sa.String(length=100), nullable=False),
+        sa.Column('pincode', sa.String(length=10), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+        sa.UniqueConstraint('emailId'),
+        if_not_exists=True
+    )
+    op.create_table('parking_lot',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('prime_location', sa.String(length=100), nullable=False),
+        sa.Column('address', sa.String(length=100), nullable=False),
+        sa.Column('pincode', sa.String(length=10), nullable=False),
+        sa.Column('price_per_hour', sa.Float(), nullable=False),
+        sa.Column('max_spots', sa.Integer(), nullable=False),
+        sa.Column('revenue_per_lot', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_table('parking_spot',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('parking_lot_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.ForeignKeyConstraint(['parking_lot_id'], ['parking_lot.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_table('booking',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('spot_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('entry_time', sa.DateTime(), nullable=False),
+        sa.Column('exit_time', sa.DateTime(), nullable=True),
+        sa.Column('vehicle_number', sa.String(length=20), nullable=False),
+        sa.Column('vehicle_brand', sa.String(length=30), nullable=False),
+        sa.Column('vehicle_model', sa.String(length=30), nullable=False),
+        sa.Column('cost', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['spot_id'], ['parking_spot.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('booking')
+    op.drop_table('parking_spot')
+    op.drop_table('parking_lot')
+    op.drop_table('user')
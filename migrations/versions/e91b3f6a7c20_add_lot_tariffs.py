@@ -0,0 +1,34 @@
+"""add per-lot tariffs
+
+Revision ID: e91b3f6a7c20
+Revises: c47e1d9a2b58
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91b3f6a7c20'
+down_revision = 'c47e1d9a2b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tariff',
+        sa.Column('lot_id', sa.Integer(), nullable=False),
+        sa.Column('peak_rate', sa.Float(), nullable=True),
+        sa.Column('peak_start', sa.Integer(), nullable=False),
+        sa.Column('peak_end', sa.Integer(), nullable=False),
+        sa.Column('daily_cap', sa.Float(), nullable=True),
+        sa.Column('grace_minutes', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['lot_id'], ['parking_lot.id'], ),
+        sa.PrimaryKeyConstraint('lot_id'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('tariff')
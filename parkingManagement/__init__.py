@@ -1,13 +1,28 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from flask_migrate import Migrate
+from parkingManagement.database import configure_engine, database_uri, engine_options
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///parking.db'
+# DATABASE_URL may point at Postgres; DB_PROFILE picks connection settings ('default' or 'tuned')
+app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(os.environ.get('DATABASE_URL', 'sqlite:///parking.db'))
+app.config['DB_PROFILE'] = os.environ.get('DB_PROFILE', 'default')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config['DB_PROFILE'])
 app.config['SECRET_KEY'] = 'ecbfe97b3bf60a235ae7df34'
+# Shared secret gate hardware sends in the X-Gate-Key header; unset disables key access
+app.config['GATE_API_KEY'] = os.environ.get('GATE_API_KEY')
+# Keep spot occupancy in memory and write it behind to the database (single process only)
+app.config['OCCUPANCY_ENGINE'] = os.environ.get('OCCUPANCY_ENGINE') == '1'
+# Per-endpoint timing and SQL counts for /admin/metrics; requests over the threshold are logged as N+1 suspects
+app.config['INSTRUMENTATION'] = os.environ.get('INSTRUMENTATION') == '1'
+app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '10'))
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
 db = SQLAlchemy(app)
+with app.app_context():
+    configure_engine(db.engine, app.config['DB_PROFILE'])
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 migrate = Migrate(app, db)
@@ -16,4 +31,9 @@ migrate = Migrate(app, db)
 ADMIN_USERNAME = 'admin'
 ADMIN_PASSWORD = 'admin@123'
 
-from parkingManagement import controllers
\ No newline at end of file
+from parkingManagement import controllers, commands
+
+if app.config['INSTRUMENTATION']:
+    from parkingManagement.instrumentation import request_metrics
+    with app.app_context():
+        request_metrics.install(app, db.engine)
\ No newline at end of file
@@ -0,0 +1,92 @@
+import threading
+from collections import deque
+from sqlalchemy import select, update
+from parkingManagement import db
+from parkingManagement.modals import ParkingSpot
+
+
+class SpotAllocator:
+    """Hands out free spots per lot without double-booking.
+
+    Candidate spot ids come from an in-process free list that is refilled
+    from the database in batches. The claim itself is a conditional
+    ``UPDATE ... WHERE status='free'``, so the row count decides who wins;
+    a stale candidate (taken by another worker, deleted, ...) is skipped
+    and the next one is tried.
+    """
+
+    def __init__(self, refill_size=64, max_refills=5):
+        self.refill_size = refill_size
+        self.max_refills = max_refills
+        self._lock = threading.Lock()
+        self._free = {}
+
+    def claim(self, lot_id, exclude=(), prefer=None):
+        """Mark one free spot of the lot as occupied and return its id.
+
+        The update runs in the current session transaction, so the caller
+        commits it together with the booking. ``prefer`` is tried first;
+        spots in ``exclude`` are passed over and stay pooled for later
+        claims. Returns None when the lot has no eligible free spot left.
+        """
+        if prefer is not None and self._take(prefer):
+            return prefer
+        skipped = []
+        refills = 0
+        try:
+            while True:
+                spot_id = self._pop(lot_id)
+                if spot_id is None:
+                    if refills >= self.max_refills or not self._refill(lot_id, exclude):
+                        return None
+                    refills += 1
+                    continue
+                if spot_id in exclude:
+                    skipped.append(spot_id)
+                elif self._take(spot_id):
+                    return spot_id
+        finally:
+            if skipped:
+                with self._lock:
+                    self._free.setdefault(lot_id, deque()).extend(skipped)
+
+    def release(self, lot_id, spot_id):
+        """Offer a spot freed by a committed release back to the pool."""
+        with self._lock:
+            pool = self._free.get(lot_id)
+            if pool is not None:
+                pool.append(spot_id)
+
+    def forget(self, lot_id):
+        """Drop the cached free list of a lot, e.g. after it was resized or deleted."""
+        with self._lock:
+            self._free.pop(lot_id, None)
+
+    def _pop(self, lot_id):
+        with self._lock:
+            pool = self._free.get(lot_id)
+            if pool:
+                return pool.popleft()
+        return None
+
+    def _take(self, spot_id):
+        result = db.session.execute(
+            update(ParkingSpot)
+            .where(ParkingSpot.id == spot_id, ParkingSpot.status == 'free')
+            .values(status='occupied')
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def _refill(self, lot_id, exclude=()):
+        query = select(ParkingSpot.id).where(ParkingSpot.parking_lot_id == lot_id, ParkingSpot.status == 'free')
+        if exclude:
+            query = query.where(ParkingSpot.id.not_in(exclude))
+        spot_ids = db.session.execute(query.order_by(ParkingSpot.id).limit(self.refill_size)).scalars().all()
+        with self._lock:
+            pool = self._free.setdefault(lot_id, deque())
+            pool.extend(spot_ids)
+        return bool(spot_ids)
+
+
+spot_allocator = SpotAllocator()
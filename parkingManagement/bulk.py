@@ -0,0 +1,281 @@
+import csv
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select, update
+from parkingManagement import db, bcrypt
+from parkingManagement.modals import User, ParkingLot, ParkingSpot, Booking, Reservation
+from parkingManagement.occupancy import reconcile_spot_status
+from parkingManagement.pricing import TariffSchedule
+from parkingManagement.locator import lot_locator
+from parkingManagement.reservations import reservation_index, align, SLOT_MINUTES, HORIZON_DAYS
+from parkingManagement.rollups import rebuild_rollups
+
+
+class BulkImportError(ValueError):
+    """A row of an import file that can't be loaded; the message names the line."""
+
+
+def _datetime(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+# Importable columns per kind with their converters; the tables are loaded in this order
+IMPORTS = {
+    'users': (User, {'id': int, 'username': str, 'password_hash': str, 'emailId': str, 'name': str,
+                     'address': str, 'pincode': str}),
+    'lots': (ParkingLot, {'id': int, 'prime_location': str, 'address': str, 'pincode': str,
+                          'price_per_hour': float, 'max_spots': int, 'revenue_per_lot': float,
+                          'latitude': float, 'longitude': float}),
+    'spots': (ParkingSpot, {'id': int, 'parking_lot_id': int, 'status': str}),
+    'bookings': (Booking, {'id': int, 'spot_id': int, 'user_id': int, 'entry_time': _datetime,
+                           'exit_time': _datetime, 'vehicle_number': str, 'vehicle_brand': str,
+                           'vehicle_model': str, 'cost': float}),
+}
+# Columns that may be left out or empty, with the value used then; a missing id is assigned by the database
+DEFAULTS = {'revenue_per_lot': 0.0, 'status': 'free', 'exit_time': None, 'latitude': None, 'longitude': None}
+
+
+def read_rows(path, fmt):
+    """Yield ``(line_number, row_dict)`` from a CSV (with header) or NDJSON file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+
+
+def _convert(kind, line_number, raw):
+    columns = IMPORTS[kind][1]
+    if kind == 'users' and not raw.get('password_hash') and raw.get('password'):
+        # Hashing is slow by design; export password_hash instead for large files
+        raw = dict(raw, password_hash=bcrypt.generate_password_hash(raw['password']).decode('utf-8'))
+    row = {}
+    for column, convert in columns.items():
+        value = raw.get(column)
+        if value is None or value == '':
+            if column in DEFAULTS:
+                row[column] = DEFAULTS[column]
+            elif column != 'id':
+                raise BulkImportError(f'Line {line_number}: {column} is missing.')
+            continue
+        try:
+            row[column] = convert(value)
+        except (TypeError, ValueError):
+            raise BulkImportError(f'Line {line_number}: {column} has an invalid value {value!r}.')
+    return row
+
+
+def import_rows(kind, rows, batch_size=5000):
+    """Insert ``(line_number, row_dict)`` pairs in batches, committing each batch.
+
+    Returns the number of rows loaded. After bookings, spot statuses and the
+    rollups are brought in line with the imported history.
+    """
+    model = IMPORTS[kind][0]
+    batch = []
+    count = 0
+
+    def flush():
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+        batch.clear()
+
+    for line_number, raw in rows:
+        row = _convert(kind, line_number, raw)
+        # One executemany needs the same columns in every row
+        if batch and (len(batch) >= batch_size or row.keys() != batch[0].keys()):
+            flush()
+        batch.append(row)
+        count += 1
+    if batch:
+        flush()
+
+    if kind == 'lots':
+        lot_locator.invalidate()
+    if kind == 'bookings':
+        reconcile_spot_status()
+        db.session.commit()
+        rebuild_rollups()
+    return count
+
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan', 'Rohan',
+               'Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Priya', 'Kavya', 'Meera', 'Isha', 'Neha', 'Riya']
+LAST_NAMES = ['Sharma', 'Verma', 'Iyer', 'Reddy', 'Nair', 'Patel', 'Gupta', 'Rao', 'Singh', 'Kulkarni',
+              'Menon', 'Das', 'Joshi', 'Bose', 'Khan']
+AREAS = ['Indiranagar', 'Koramangala', 'Whitefield', 'Jayanagar', 'Malleshwaram', 'Hebbal', 'Marathahalli',
+         'Electronic City', 'Yelahanka', 'Banashankari', 'HSR Layout', 'BTM Layout', 'Rajajinagar', 'Ulsoor']
+PLACES = ['Mall', 'Metro Station', 'Tech Park', 'Hospital', 'Market', 'Stadium', 'Airport Terminal', 'Plaza']
+VEHICLES = {'Maruti': ['Swift', 'Baleno', 'Dzire', 'Brezza'], 'Hyundai': ['i20', 'Creta', 'Venue'],
+            'Honda': ['City', 'Amaze'], 'Tata': ['Nexon', 'Punch', 'Harrier'], 'Mahindra': ['XUV700', 'Thar'],
+            'Toyota': ['Innova', 'Glanza'], 'Kia': ['Seltos', 'Sonet']}
+STATES = ['KA', 'TN', 'MH', 'AP', 'TS', 'KL', 'DL']
+
+
+def generate(users=1000, lots=20, bookings=50000, days=365, seed=42, open_share=0.3, batch_size=10000,
+             progress=None, reservations=0):
+    """Add a synthetic, reproducible dataset on top of whatever the database holds.
+
+    Bookings of a spot never overlap: each spot's share of ``bookings`` is
+    laid out along the last ``days`` days, one per time slot, and with
+    probability ``open_share`` its last booking is still running. Costs
+    follow the hourly billing rule; lot revenue, spot statuses and the
+    rollups are filled in to match. ``reservations`` are spread the same
+    way over the reservation horizon ahead. Returns the number of rows per
+    table.
+    """
+    if (bookings or reservations) and not (users and lots):
+        raise ValueError('Bookings and reservations need at least one generated user and lot.')
+    rng = random.Random(seed)
+    report = progress or (lambda message: None)
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    pincodes = [str(560001 + rng.randrange(110)) for _ in range(40)]
+    # Pincode areas spread over Bengaluru, each lot near its area's centre; a separate generator keeps
+    # the rest of the data the same as before lots had coordinates
+    places = random.Random(f'{seed}-coordinates')
+    centres = {pincode: (places.uniform(12.85, 13.10), places.uniform(77.48, 77.75)) for pincode in pincodes}
+    brands = list(VEHICLES)
+
+    # Users; every user shares one password hash, bcrypt is far too slow to run per row
+    first_user = (db.session.scalar(select(func.max(User.id))) or 0) + 1
+    password_hash = bcrypt.generate_password_hash('password123').decode('utf-8')
+    vehicles = []
+    _insert_batches(User, ({
+        'username': f'user{n}',
+        'password_hash': password_hash,
+        'emailId': f'user{n}@example.com',
+        'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'address': f'{rng.randint(1, 999)}, {rng.choice(AREAS)}, Bengaluru',
+        'pincode': rng.choice(pincodes)
+    } for n in range(first_user, first_user + users)), batch_size)
+    user_ids = db.session.scalars(select(User.id).where(User.id >= first_user).order_by(User.id)).all()
+    for _ in user_ids:
+        brand = rng.choice(brands)
+        vehicles.append((f'{rng.choice(STATES)}{rng.randint(1, 60):02d}'
+                         f'{chr(65 + rng.randrange(26))}{chr(65 + rng.randrange(26))}{rng.randint(1, 9999):04d}',
+                         brand, rng.choice(VEHICLES[brand])))
+    report(f'{len(user_ids)} users')
+
+    # Lots and their spots
+    first_lot = (db.session.scalar(select(func.max(ParkingLot.id))) or 0) + 1
+
+    def new_lots():
+        for n in range(first_lot, first_lot + lots):
+            row = {
+                'prime_location': f'{rng.choice(AREAS)} {rng.choice(PLACES)} {n}',
+                'address': f'{rng.randint(1, 200)} Main Road, Bengaluru',
+                'pincode': rng.choice(pincodes),
+                'price_per_hour': float(rng.choice([20, 30, 40, 50, 60, 80, 100])),
+                'max_spots': rng.randint(20, 380),
+                'revenue_per_lot': 0.0
+            }
+            latitude, longitude = centres[row['pincode']]
+            row['latitude'] = round(latitude + places.gauss(0, 0.01), 6)
+            row['longitude'] = round(longitude + places.gauss(0, 0.01), 6)
+            yield row
+
+    _insert_batches(ParkingLot, new_lots(), batch_size)
+    lot_rows = db.session.execute(select(ParkingLot.id, ParkingLot.max_spots, ParkingLot.price_per_hour)
+                                  .where(ParkingLot.id >= first_lot).order_by(ParkingLot.id)).all()
+    _insert_batches(ParkingSpot, ({'parking_lot_id': lot_id, 'status': 'free'}
+                                  for lot_id, max_spots, _ in lot_rows for _ in range(max_spots)), batch_size)
+    spots = db.session.execute(select(ParkingSpot.id, ParkingSpot.parking_lot_id)
+                               .where(ParkingSpot.parking_lot_id >= first_lot).order_by(ParkingSpot.id)).all()
+    report(f'{len(lot_rows)} lots, {len(spots)} spots')
+
+    # Bookings, spread evenly over the spots
+    prices = {lot_id: price for lot_id, _, price in lot_rows}
+    # Generated lots have no tariff of their own, so they bill the plain hourly rate
+    schedules = {lot_id: TariffSchedule(price) for lot_id, price in prices.items()}
+    revenue = dict.fromkeys(prices, 0.0)
+    span = (now - start).total_seconds()
+
+    def booking_rows():
+        for index, (spot_id, lot_id) in enumerate(spots):
+            count = bookings // len(spots) + (index < bookings % len(spots))
+            if not count:
+                continue
+            slot = span / count
+            for j in range(count):
+                user = rng.randrange(len(user_ids))
+                vehicle_number, brand, model = vehicles[user]
+                # Mostly one to three hours, occasionally a whole working day
+                duration = min(rng.lognormvariate(math.log(2 * 3600), 0.7), 12 * 3600, slot * 0.9)
+                entry_time = start + timedelta(seconds=j * slot + rng.uniform(0, slot - duration))
+                exit_time = (entry_time + timedelta(seconds=duration)).replace(microsecond=0)
+                entry_time = entry_time.replace(microsecond=0)
+                if j == count - 1 and rng.random() < open_share:
+                    exit_time = None
+                    cost = prices[lot_id]
+                else:
+                    cost = schedules[lot_id].quote(entry_time, exit_time)
+                    revenue[lot_id] += cost
+                yield {'spot_id': spot_id, 'user_id': user_ids[user],
+                       'entry_time': entry_time, 'exit_time': exit_time,
+                       'vehicle_number': vehicle_number, 'vehicle_brand': brand, 'vehicle_model': model,
+                       'cost': cost}
+
+    booked = _insert_batches(Booking, booking_rows(), batch_size,
+                             lambda done: report(f'{done} bookings') if done % (batch_size * 50) == 0 else None)
+    report(f'{booked} bookings')
+
+    # Reservations, whole slots of up to four hours starting from the next slot
+    first_slot = align(now, now + timedelta(minutes=1))[1]
+    horizon_slots = HORIZON_DAYS * 24 * 60 // SLOT_MINUTES
+
+    def reservation_rows():
+        for index, (spot_id, lot_id) in enumerate(spots):
+            count = min(reservations // len(spots) + (index < reservations % len(spots)), horizon_slots)
+            if not count:
+                continue
+            width = horizon_slots // count
+            for j in range(count):
+                length = rng.randint(1, min(width, 4 * 60 // SLOT_MINUTES))
+                start_time = first_slot + timedelta(minutes=(j * width + rng.randrange(width - length + 1))
+                                                    * SLOT_MINUTES)
+                vehicle_number, brand, model = vehicles[rng.randrange(len(user_ids))]
+                yield {'lot_id': lot_id, 'spot_id': spot_id, 'user_id': rng.choice(user_ids),
+                       'start_time': start_time, 'end_time': start_time + timedelta(minutes=length * SLOT_MINUTES),
+                       'vehicle_number': vehicle_number, 'vehicle_brand': brand, 'vehicle_model': model,
+                       'status': 'reserved'}
+
+    reserved = _insert_batches(Reservation, reservation_rows(), batch_size) if reservations else 0
+    if reserved:
+        report(f'{reserved} reservations')
+
+    if revenue:
+        db.session.execute(update(ParkingLot), [{'id': lot_id, 'revenue_per_lot': total}
+                                                for lot_id, total in revenue.items()])
+    reconcile_spot_status()
+    db.session.commit()
+    rebuild_rollups()
+    reservation_index.invalidate()
+    lot_locator.invalidate()
+    return {'users': len(user_ids), 'lots': len(lot_rows), 'spots': len(spots), 'bookings': booked,
+            'reservations': reserved}
+
+
+def _insert_batches(model, rows, batch_size, on_batch=None):
+    batch = []
+    done = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.session.execute(insert(model), batch)
+            db.session.commit()
+            done += len(batch)
+            batch = []
+            if on_batch:
+                on_batch(done)
+    if batch:
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+        done += len(batch)
+    return done
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ChartCache:
+    """LRU cache of rendered chart PNGs.
+
+    Keys are expected to carry a data version, so a stale entry is simply
+    never asked for again and ages out. Cold renders run on a small worker
+    pool, and concurrent requests for the same key share a single render.
+    """
+
+    def __init__(self, max_entries=256, workers=2):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chart-render')
+
+    def get(self, key, load, render):
+        """Return the PNG for ``key``, rendering it on a miss.
+
+        ``load`` runs in the calling thread (it may touch the database) and
+        returns the arguments for ``render``, which runs on the worker pool.
+        """
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                return png
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            png = self._executor.submit(render, *load()).result()
+        except BaseException as e:
+            with self._lock:
+                self._pending.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._pending.pop(key, None)
+            self._entries[key] = png
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.set_result(png)
+        return png
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+chart_cache = ChartCache()
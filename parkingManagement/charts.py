@@ -0,0 +1,29 @@
+import io
+from matplotlib.figure import Figure
+
+# An inch per label, within these bounds
+MIN_WIDTH_INCHES = 6
+MAX_WIDTH_INCHES = 30
+
+
+def render_chart(labels, values, kind, xlabel, ylabel, title, color):
+    # Uses the object-oriented Figure API: pyplot's global state is not thread-safe
+    fig = Figure(figsize=(min(max(MIN_WIDTH_INCHES, len(labels)), MAX_WIDTH_INCHES), 4), facecolor='#343a40')
+    ax = fig.subplots()
+    if kind == 'line':
+        ax.plot(labels, values, marker='o', color=color)
+    else:
+        ax.bar(labels, values, color=color)
+    ax.set_xlabel(xlabel, color='white')
+    ax.set_ylabel(ylabel, color='white')
+    ax.set_title(title, color='white')
+    ax.tick_params(axis='x', rotation=45, labelcolor='white')
+    ax.tick_params(axis='y', labelcolor='white')
+    fig.patch.set_facecolor('#343a40')
+    ax.set_facecolor('#343a40')
+    for spine in ax.spines.values():
+        spine.set_color('white')
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    return buf.getvalue()
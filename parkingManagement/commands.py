@@ -0,0 +1,146 @@
+import click
+from sqlalchemy import delete
+from parkingManagement import app, db
+from parkingManagement import bulk, exports, pricing
+from parkingManagement.modals import ParkingLot, Tariff
+from parkingManagement.rollups import rebuild_rollups
+
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the user-month and lot-day rollups from the booking history."""
+    users, lots = rebuild_rollups()
+    click.echo(f'Rebuilt {users} user-month and {lots} lot-day rollup rows.')
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(list(exports.EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(list(exports.FORMATS)), default='csv', show_default=True)
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='First entry date to include.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Last entry date to include.')
+@click.option('--lot-id', type=int, help='Only this parking lot.')
+@click.option('--output', type=click.File('w'), default='-', help='File to write; standard output by default.')
+def export_command(kind, fmt, start, end, lot_id, output):
+    """Stream bookings or per-lot daily revenue as CSV or NDJSON."""
+    for chunk in exports.export(kind, fmt, start and start.date(), end and end.date(), lot_id):
+        output.write(chunk)
+
+
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(list(bulk.IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(list(exports.FORMATS)),
+              help='File format; guessed from the extension by default.')
+@click.option('--batch-size', type=int, default=5000, show_default=True)
+def import_data_command(kind, path, fmt, batch_size):
+    """Bulk-load users, lots, spots or bookings from a CSV or NDJSON file.
+
+    Columns are named after the model attributes. Load the kinds in the
+    order users, lots, spots, bookings so references resolve.
+    """
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    try:
+        count = bulk.import_rows(kind, bulk.read_rows(path, fmt), batch_size)
+    except (bulk.BulkImportError, ValueError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Imported {count} {kind}.')
+
+
+@app.cli.command('generate-data')
+@click.option('--users', type=int, default=1000, show_default=True)
+@click.option('--lots', type=int, default=20, show_default=True)
+@click.option('--bookings', type=int, default=50000, show_default=True)
+@click.option('--days', type=int, default=365, show_default=True, help='Length of the booking history.')
+@click.option('--reservations', type=int, default=0, show_default=True, help='Upcoming reservations to add.')
+@click.option('--seed', type=int, default=42, show_default=True)
+@click.option('--batch-size', type=int, default=10000, show_default=True)
+def generate_data_command(users, lots, bookings, days, reservations, seed, batch_size):
+    """Add a reproducible synthetic dataset, e.g. --users 100000 --lots 500 --bookings 10000000."""
+    try:
+        counts = bulk.generate(users, lots, bookings, days, seed, batch_size=batch_size, progress=click.echo,
+                               reservations=reservations)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo('Generated ' + ', '.join(f'{count} {name}' for name, count in counts.items()) + '.')
+
+
+def _peak_hours(ctx, param, value):
+    # "8-11" -> (8, 11); the end may be smaller than the start for windows past midnight
+    if value is None:
+        return None
+    try:
+        start, end = (int(hour) for hour in value.split('-'))
+    except ValueError:
+        raise click.BadParameter('expected START-END hours, e.g. 8-11')
+    if not (0 <= start < 24 and 0 <= end < 24) or start == end:
+        raise click.BadParameter('hours must be distinct and between 0 and 23')
+    return start, end
+
+
+@app.cli.command('set-tariff')
+@click.argument('lot_id', type=int)
+@click.option('--peak-rate', type=float, help='Hourly rate during the peak hours.')
+@click.option('--peak-hours', callback=_peak_hours, help='Peak window as START-END hours of the day, e.g. 8-11.')
+@click.option('--daily-cap', type=float, help='Most a stay can cost per 24 hours.')
+@click.option('--grace-minutes', type=int, help='Stays up to this long are free.')
+@click.option('--clear', is_flag=True, help='Remove the tariff; the lot bills its hourly price again.')
+def set_tariff_command(lot_id, peak_rate, peak_hours, daily_cap, grace_minutes, clear):
+    """Set the peak rate, daily cap or grace period of a parking lot."""
+    lot = db.session.get(ParkingLot, lot_id)
+    if not lot:
+        raise click.ClickException(f'Parking lot {lot_id} not found.')
+    if clear:
+        db.session.execute(delete(Tariff).where(Tariff.lot_id == lot_id))
+        db.session.commit()
+        click.echo(f'Lot {lot_id} bills {lot.price_per_hour} per hour.')
+        return
+    tariff = lot.tariff or Tariff(lot_id=lot_id, peak_start=0, peak_end=0, grace_minutes=0)
+    if peak_rate is not None:
+        tariff.peak_rate = peak_rate
+    if peak_hours is not None:
+        tariff.peak_start, tariff.peak_end = peak_hours
+    if daily_cap is not None:
+        tariff.daily_cap = daily_cap
+    if grace_minutes is not None:
+        tariff.grace_minutes = grace_minutes
+    if tariff.peak_rate is not None and tariff.peak_start == tariff.peak_end:
+        raise click.ClickException('A peak rate needs --peak-hours.')
+    db.session.add(tariff)
+    db.session.commit()
+    click.echo(f'Lot {lot_id}: base {lot.price_per_hour}, peak {tariff.peak_rate} '
+               f'({tariff.peak_start}-{tariff.peak_end}h), cap {tariff.daily_cap}, grace {tariff.grace_minutes} min.')
+
+
+@app.cli.command('simulate-tariff')
+@click.option('--lot-id', type=int, help='Only this parking lot.')
+@click.option('--base-rate', type=float, help='Hourly rate outside the peak hours.')
+@click.option('--peak-rate', type=float, help='Hourly rate during the peak hours.')
+@click.option('--peak-hours', callback=_peak_hours, help='Peak window as START-END hours of the day, e.g. 8-11.')
+@click.option('--daily-cap', type=float, help='Most a stay can cost per 24 hours.')
+@click.option('--grace-minutes', type=int, help='Stays up to this long are free.')
+def simulate_tariff_command(lot_id, base_rate, peak_rate, peak_hours, daily_cap, grace_minutes):
+    """Re-price the completed bookings with changed tariffs and compare the revenue.
+
+    Options left out keep each lot's current setting; without any the
+    current tariffs are re-applied, which shows how far recorded costs drift.
+    """
+    changes = {name: value for name, value in (('base_rate', base_rate), ('peak_rate', peak_rate),
+                                               ('daily_cap', daily_cap), ('grace_minutes', grace_minutes))
+               if value is not None}
+    if peak_hours is not None:
+        changes['peak_start'], changes['peak_end'] = peak_hours
+    schedules = pricing.lot_schedules([lot_id] if lot_id is not None else None)
+    if lot_id is not None and not schedules:
+        raise click.ClickException(f'Parking lot {lot_id} not found.')
+    overrides = {lot: schedule.replace(**changes) for lot, schedule in schedules.items()}
+    totals = pricing.simulate_revenue(overrides, lot_id)
+    click.echo(f'{"lot":>6} {"bookings":>10} {"recorded":>14} {"simulated":>14} {"change":>8}')
+    recorded_sum = simulated_sum = 0.0
+    for lot, (bookings, recorded, simulated) in sorted(totals.items()):
+        recorded_sum += recorded
+        simulated_sum += simulated
+        change = f'{(simulated - recorded) / recorded:+.1%}' if recorded else '-'
+        click.echo(f'{lot:>6} {bookings:>10} {recorded:>14.2f} {simulated:>14.2f} {change:>8}')
+    change = f'{(simulated_sum - recorded_sum) / recorded_sum:+.1%}' if recorded_sum else '-'
+    click.echo(f'{"total":>6} {sum(b for b, _, _ in totals.values()):>10} {recorded_sum:>14.2f} '
+               f'{simulated_sum:>14.2f} {change:>8}')
@@ -1,17 +1,246 @@
-from flask import render_template, redirect, url_for, flash, session, request, jsonify, make_response
+from flask import render_template, redirect, url_for, flash, session, request, jsonify, make_response, Response, \
+    stream_with_context
 from flask_login import login_user, logout_user, current_user, login_required
 from parkingManagement import app, db, ADMIN_PASSWORD, ADMIN_USERNAME
-from parkingManagement.forms import RegistrationForm, LoginForm, ParkingLotForm, BookingForm
-from parkingManagement.modals import User, ParkingLot, ParkingSpot, Booking
+from parkingManagement.forms import RegistrationForm, LoginForm, ParkingLotForm, BookingForm, ReservationForm
+from parkingManagement.modals import User, ParkingLot, ParkingSpot, Booking, Reservation, Tariff, \
+    UserMonthRollup, LotDayRollup
+from parkingManagement.allocator import spot_allocator
+from parkingManagement.services import booking_service, BookingError
+from sqlalchemy import func, distinct, case, select, insert, delete, and_, or_
 from sqlalchemy.exc import SQLAlchemyError
-import io
-import matplotlib
-import matplotlib.pyplot as plt
-from datetime import datetime
-from collections import Counter, defaultdict
-import matplotlib.dates as mdates
-
-matplotlib.use('Agg')
+from sqlalchemy.orm import joinedload
+from parkingManagement.chart_cache import chart_cache
+from parkingManagement.events import occupancy_broker
+from parkingManagement.occupancy import occupancy_engine
+from parkingManagement.reservations import reservation_index, align
+from parkingManagement.locator import lot_locator, MAX_RESULTS
+from parkingManagement.user_cache import user_cache
+from parkingManagement.instrumentation import request_metrics
+from parkingManagement import exports
+import hashlib
+import hmac
+from datetime import datetime, timedelta
+
+
+def occupied_spots_by_lot():
+    if occupancy_engine.enabled:
+        return occupancy_engine.occupied_by_lot()
+    # One grouped query instead of a COUNT per lot; lots with no occupied spots are absent
+    rows = db.session.query(ParkingSpot.parking_lot_id, func.count(ParkingSpot.id)) \
+        .filter(ParkingSpot.status == 'occupied') \
+        .group_by(ParkingSpot.parking_lot_id).all()
+    return dict(rows)
+
+
+def search_point(args, default_pincode=None):
+    # (latitude, longitude) from ?lat=&lng= or ?pincode=, falling back to default_pincode;
+    # None when there is nothing to search from, ValueError when it can't be resolved
+    if args.get('lat') or args.get('lng'):
+        try:
+            latitude, longitude = float(args.get('lat', '')), float(args.get('lng', ''))
+        except ValueError:
+            raise ValueError('lat and lng must both be numbers.')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError('lat and lng must be valid coordinates.')
+        return latitude, longitude
+    pincode = args.get('pincode', '').strip() or default_pincode
+    if not pincode:
+        return None
+    point = lot_locator.locate(pincode)
+    if point is None:
+        raise ValueError(f'No parking lots are mapped in pincode {pincode}.')
+    return point
+
+
+def coordinate(value, limit):
+    # An optional latitude (limit 90) or longitude (limit 180) from a form field
+    if value is None or not value.strip():
+        return None
+    value = float(value)
+    if not -limit <= value <= limit:
+        raise ValueError(f'{value} is not a valid coordinate.')
+    return value
+
+
+def add_free_spots(lot_id, count):
+    # One executemany INSERT instead of an ORM object per spot
+    if count > 0:
+        db.session.execute(insert(ParkingSpot), [{'parking_lot_id': lot_id, 'status': 'free'}] * count)
+
+
+def remove_free_spots(lot_id, count=None):
+    # Deletes up to count free spots without upcoming reservations (all of them when count is None),
+    # newest first; returns how many went
+    reserved = select(Reservation.spot_id).where(
+        Reservation.lot_id == lot_id, Reservation.status != 'cancelled', Reservation.end_time > datetime.now())
+    removable = and_(ParkingSpot.parking_lot_id == lot_id, ParkingSpot.status == 'free',
+                     ParkingSpot.id.not_in(reserved))
+    statement = delete(ParkingSpot).where(removable)
+    if count is not None:
+        newest_free = select(ParkingSpot.id).where(removable).order_by(ParkingSpot.id.desc()).limit(count)
+        statement = delete(ParkingSpot).where(ParkingSpot.id.in_(newest_free))
+    return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+
+def booking_stats_per_user():
+    # Bookings and distinct vehicles for every user in one grouped query
+    return db.session.query(
+        User.id,
+        User.name,
+        User.emailId,
+        func.count(Booking.id).label('booking_count'),
+        func.count(distinct(Booking.vehicle_number)).label('vehicle_count')
+    ).outerjoin(Booking, Booking.user_id == User.id) \
+        .group_by(User.id).order_by(User.id).all()
+
+
+def chart_data_version(chart, user_id=None):
+    # Cheap fingerprint of the rows a chart is drawn from; it changes whenever they do
+    if chart == 'bookings_per_user':
+        # SQLite hands the id of a deleted last row to the next insert, so the newest id alone
+        # can come back to an old value; the row counts change with the delete. A bare count(*)
+        # is answered from the smallest b-tree without reading the rows
+        return tuple(db.session.execute(select(
+            select(func.count()).select_from(User).scalar_subquery(), select(func.max(User.id)).scalar_subquery(),
+            select(func.count()).select_from(Booking).scalar_subquery(), select(func.max(Booking.id)).scalar_subquery()
+        )).one())
+    if chart == 'revenue_per_lot':
+        return tuple(db.session.query(
+            func.count(ParkingLot.id), func.max(ParkingLot.id), func.coalesce(func.sum(ParkingLot.revenue_per_lot), 0.0)
+        ).one())
+    # The per-user charts are drawn from the user's rollup rows
+    return tuple(db.session.query(
+        func.count(UserMonthRollup.month), func.coalesce(func.sum(UserMonthRollup.bookings), 0.0),
+        func.coalesce(func.sum(UserMonthRollup.completed), 0.0), func.coalesce(func.sum(UserMonthRollup.spend), 0.0)
+    ).filter(UserMonthRollup.user_id == user_id).one())
+
+
+def revenue_per_lot_series():
+    return db.session.query(ParkingLot.prime_location, ParkingLot.revenue_per_lot).all()
+
+
+def monthly_booking_series(user_id):
+    # Bookings and completed-booking spend per entry month, straight from the rollup
+    return db.session.query(
+        UserMonthRollup.month.label('month'),
+        UserMonthRollup.bookings.label('bookings'),
+        UserMonthRollup.spend.label('spending')
+    ).filter(UserMonthRollup.user_id == user_id).order_by(UserMonthRollup.month).all()
+
+
+def daily_revenue_series(days, lot_id=None):
+    # Completed-booking revenue per entry day over the last `days` days, all lots or one
+    since = datetime.now().date() - timedelta(days=days - 1)
+    query = db.session.query(LotDayRollup.day, func.coalesce(func.sum(LotDayRollup.revenue), 0.0)) \
+        .filter(LotDayRollup.day >= since)
+    if lot_id is not None:
+        query = query.filter(LotDayRollup.lot_id == lot_id)
+    return query.group_by(LotDayRollup.day).order_by(LotDayRollup.day).all()
+
+
+BOOKINGS_PAGE_SIZE = 20
+
+
+def encode_booking_cursor(booking):
+    return f"{booking.entry_time.isoformat()}_{booking.id}"
+
+
+def decode_booking_cursor(cursor):
+    # Returns (entry_time, id), or None for a missing or malformed cursor
+    try:
+        entry_time, booking_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(entry_time), int(booking_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def booking_history_page(user_id, cursor=None, limit=BOOKINGS_PAGE_SIZE):
+    # Newest first, keyed on (entry_time, id) so a deep page costs the same as the first one
+    query = Booking.query.options(joinedload(Booking.spot).joinedload(ParkingSpot.parking_lot)) \
+        .filter(Booking.user_id == user_id)
+    position = decode_booking_cursor(cursor)
+    if position:
+        entry_time, booking_id = position
+        query = query.filter(or_(
+            Booking.entry_time < entry_time,
+            and_(Booking.entry_time == entry_time, Booking.id < booking_id)
+        ))
+    bookings = query.order_by(Booking.entry_time.desc(), Booking.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_booking_cursor(bookings[limit - 1]) if len(bookings) > limit else None
+    return bookings[:limit], next_cursor
+
+
+def upcoming_reservations(user_id):
+    return Reservation.query.options(joinedload(Reservation.lot)) \
+        .filter(Reservation.user_id == user_id, Reservation.status == 'reserved',
+                Reservation.end_time > datetime.now()) \
+        .order_by(Reservation.start_time).all()
+
+
+def booking_totals(user_id):
+    # (total bookings, active bookings, total spent on completed bookings), summed over the user's months
+    return db.session.query(
+        func.coalesce(func.sum(UserMonthRollup.bookings), 0),
+        func.coalesce(func.sum(UserMonthRollup.bookings - UserMonthRollup.completed), 0),
+        func.coalesce(func.sum(UserMonthRollup.spend), 0.0)
+    ).filter(UserMonthRollup.user_id == user_id).one()
+
+
+def conditional_response(key, build):
+    # The key embeds the data version, so its hash is a strong ETag
+    etag = hashlib.sha1(repr(key).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# Charts with a bar per user or lot ('top') keep only this many of their largest values, and monthly
+# charts ('recent') their latest months; otherwise they would grow without bound
+CHART_MAX_BARS = 50
+
+
+def chart_response(chart, load, style, user_id=None):
+    # load runs only on a cache miss; the (labels, values) it returns are drawn on the worker pool
+    key = (chart, user_id, chart_data_version(chart, user_id))
+
+    def render(labels, values):
+        # matplotlib is imported on first use, so workers that never draw a chart skip it
+        from parkingManagement.charts import render_chart
+        options = dict(style)
+        truncate = options.pop('truncate', None)
+        if truncate and len(labels) > CHART_MAX_BARS:
+            if truncate == 'top':
+                # The largest values, still in their original order
+                kept = sorted(sorted(range(len(values)), key=values.__getitem__, reverse=True)[:CHART_MAX_BARS])
+                options['title'] += f' (top {CHART_MAX_BARS})'
+            else:
+                kept = range(len(labels) - CHART_MAX_BARS, len(labels))
+                options['title'] += f' (last {CHART_MAX_BARS})'
+            labels, values = [labels[i] for i in kept], [values[i] for i in kept]
+        return render_chart(labels, values, **options)
+
+    return conditional_response(key, lambda: make_response(
+        chart_cache.get(key, load, render), 200, {'Content-Type': 'image/png'}))
+
+
+def series_response(chart, build, user_id=None):
+    key = ('json', chart, user_id, chart_data_version(chart, user_id))
+    return conditional_response(key, lambda: jsonify(build()))
+
+
+@app.before_request
+def load_occupancy_engine():
+    if occupancy_engine.enabled:
+        occupancy_engine.ensure_loaded()
+
+
+# Lots listed on the home page when the user's location is known
+HOME_NEAREST_LOTS = 20
 
 
 @app.route('/')
@@ -19,29 +248,48 @@ def home_page():
     if not current_user.is_authenticated:
         return render_template('public_home.html', active_page='home')
 
-    parking_lots = ParkingLot.query.all()
     booking_form = BookingForm()
     user_history = []
+    next_cursor = None
     allocated_spot = session.pop('allocated_spot', None)
     allocated_lot = session.pop('allocated_lot', None)
 
-    # Prepare parking lot data with occupied spots count
-    lots_with_occupied = []
-    for lot in parking_lots:
-        occupied_spots = ParkingSpot.query.filter_by(parking_lot_id=lot.id, status='occupied').count()
-        lot_dict = lot.__dict__.copy()
-        lot_dict['occupied_spots'] = occupied_spots
-        lots_with_occupied.append(lot_dict)
+    # The lots with free spots nearest the searched (or the user's own) pincode, unless all are asked for
+    point = None
+    search_error = None
+    if not request.args.get('all'):
+        try:
+            point = search_point(request.args, current_user.pincode)
+        except ValueError as e:
+            # A user's own pincode without mapped lots just means listing every lot
+            if request.args.get('pincode') or request.args.get('lat'):
+                search_error = str(e)
+    if point:
+        lots_with_occupied = lot_locator.nearest(*point, HOME_NEAREST_LOTS, occupied_spots_by_lot)
+    else:
+        # Prepare parking lot data with occupied spots count
+        occupied_by_lot = occupied_spots_by_lot()
+        lots_with_occupied = []
+        for lot in ParkingLot.query.all():
+            lot_dict = lot.__dict__.copy()
+            lot_dict['occupied_spots'] = occupied_by_lot.get(lot.id, 0)
+            lots_with_occupied.append(lot_dict)
 
     if current_user.is_authenticated:
-        user_history = Booking.query.filter_by(user_id=current_user.id).order_by(Booking.entry_time.desc()).all()
+        user_history, next_cursor = booking_history_page(current_user.id, request.args.get('cursor'))
 
     return render_template(
         'home.html',
         active_page='home',
         parking_lots=lots_with_occupied,
+        nearby=point is not None,
+        search_pincode=request.args.get('pincode', current_user.pincode or ''),
+        search_error=search_error,
         booking_form=booking_form,
+        reservation_form=ReservationForm(),
+        reservations=upcoming_reservations(current_user.id),
         user_history=user_history,
+        next_cursor=next_cursor,
         allocated_spot=allocated_spot,
         allocated_lot=allocated_lot
     )
@@ -56,14 +304,12 @@ def admin_home_page():
     lots = ParkingLot.query.all()
     lots_data = []
 
-    # For each lot, get spots and occupancy
+    # Only per-lot summaries here; each spot grid is fetched on demand from admin_lot_spots
+    occupied_by_lot = occupied_spots_by_lot()
     for lot in lots:
-        spots = ParkingSpot.query.filter_by(parking_lot_id=lot.id).all()
-        occupied = sum(1 for s in spots if s.status == 'occupied')
         lots_data.append({
             'lot': lot,
-            'spots': spots,
-            'occupied': occupied,
+            'occupied': occupied_by_lot.get(lot.id, 0),
             'total': lot.max_spots
         })
 
@@ -75,16 +321,18 @@ def admin_home_page():
                 pincode=form.pincode.data,
                 price_per_hour=form.price_per_hour.data,
                 max_spots=form.max_spots.data,
-                revenue_per_lot=0.0
+                revenue_per_lot=0.0,
+                latitude=form.latitude.data,
+                longitude=form.longitude.data
             )
             db.session.add(lot)
-            db.session.commit()
+            db.session.flush()
 
-            # Create empty spots for the lot
-            for _ in range(lot.max_spots):
-                spot = ParkingSpot(parking_lot_id=lot.id, status='free')
-                db.session.add(spot)
-            db.session.commit()
+            # Create empty spots for the lot in the same transaction
+            with occupancy_engine.updating_lot(lot.id):
+                add_free_spots(lot.id, lot.max_spots)
+                db.session.commit()
+            lot_locator.invalidate()
 
             flash('Parking lot created successfully!', category='success')
             return redirect(url_for('admin_home_page'))
@@ -171,16 +419,24 @@ def delete_lot():
         flash('Parking lot not found.', category='danger')
         return redirect(url_for('admin_home_page'))
 
-    spots = ParkingSpot.query.filter_by(parking_lot_id=lot.id).all()
-    if any(s.status == 'occupied' for s in spots):
-        flash("Can't delete as some spots are occupied.", category='danger')
-        return redirect(url_for('admin_home_page'))
-
     try:
-        for spot in spots:
-            db.session.delete(spot)
-        db.session.delete(lot)
-        db.session.commit()
+        with occupancy_engine.updating_lot(lot.id):
+            # Free spots go first; any spot still left afterwards is occupied
+            remove_free_spots(lot.id)
+            if db.session.query(ParkingSpot.id).filter_by(parking_lot_id=lot.id).first():
+                db.session.rollback()
+                flash("Can't delete as some spots are occupied or reserved.", category='danger')
+                return redirect(url_for('admin_home_page'))
+            # SQLite reuses the ids of deleted lots, so their history must not linger
+            db.session.execute(delete(LotDayRollup).where(LotDayRollup.lot_id == lot.id))
+            db.session.execute(delete(Reservation).where(Reservation.lot_id == lot.id))
+            db.session.execute(delete(Tariff).where(Tariff.lot_id == lot.id))
+            db.session.delete(lot)
+            db.session.commit()
+        spot_allocator.forget(lot.id)
+        reservation_index.invalidate(lot.id)
+        lot_locator.invalidate()
+        occupancy_broker.publish(lot=lot.id, deleted=True)
         flash('Parking lot deleted successfully.', category='success')
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -207,30 +463,30 @@ def edit_lot():
     price_per_hour = request.form.get('price_per_hour')
     max_spots = request.form.get('max_spots')
     try:
-        lot.price_per_hour = float(price_per_hour)
-        old_max_spots = lot.max_spots
-        lot.max_spots = int(max_spots)
-        db.session.commit()
-
-        # If max_spots increased, add new spots
-        if lot.max_spots > old_max_spots:
-            for _ in range(lot.max_spots - old_max_spots):
-                spot = ParkingSpot(parking_lot_id=lot.id, status='free')
-                db.session.add(spot)
-            db.session.commit()
-        # If max_spots decreased, remove extra spots (only if they are free)
-        elif lot.max_spots < old_max_spots:
-            spots = ParkingSpot.query.filter_by(parking_lot_id=lot.id).all()
-            removable = [s for s in spots if s.status != 'occupied']
-            to_remove = old_max_spots - lot.max_spots
-            if len(removable) < to_remove:
-                flash('Cannot reduce max spots below number of occupied spots.', category='danger')
-                lot.max_spots = old_max_spots
-                db.session.commit()
-                return redirect(url_for('admin_home_page'))
-            for spot in removable[:to_remove]:
-                db.session.delete(spot)
+        with occupancy_engine.updating_lot(lot.id):
+            lot.price_per_hour = float(price_per_hour)
+            # Forms without the coordinate fields leave them as they are
+            if 'latitude' in request.form or 'longitude' in request.form:
+                lot.latitude = coordinate(request.form.get('latitude'), 90)
+                lot.longitude = coordinate(request.form.get('longitude'), 180)
+            old_max_spots = lot.max_spots
+            lot.max_spots = int(max_spots)
+
+            # If max_spots increased, add new spots
+            if lot.max_spots > old_max_spots:
+                add_free_spots(lot.id, lot.max_spots - old_max_spots)
+            # If max_spots decreased, remove extra spots (only if they are free)
+            elif lot.max_spots < old_max_spots:
+                to_remove = old_max_spots - lot.max_spots
+                if remove_free_spots(lot.id, to_remove) < to_remove:
+                    db.session.rollback()
+                    flash('Cannot reduce max spots below number of occupied or reserved spots.', category='danger')
+                    return redirect(url_for('admin_home_page'))
             db.session.commit()
+        spot_allocator.forget(lot.id)
+        reservation_index.invalidate(lot.id)
+        lot_locator.invalidate()
+        occupancy_broker.publish(lot=lot.id, max_spots=lot.max_spots)
         flash('Parking lot updated successfully.', category='success')
     except Exception as e:
         db.session.rollback()
@@ -245,108 +501,231 @@ def book_now():
         flash('Please login to book a parking spot.', category='warning')
         return redirect(url_for('login_page'))
 
-    lot_id = request.form.get('lot_id')
-    vehicle_number = request.form.get('vehicle_number')
-    vehicle_brand = request.form.get('vehicle_brand')
-    vehicle_model = request.form.get('vehicle_model')
-    lot = ParkingLot.query.get(lot_id)
-    if not lot:
-        flash('Parking lot not found.', category='danger')
+    try:
+        booking = booking_service.allocate(
+            current_user.id,
+            request.form.get('lot_id'),
+            request.form.get('vehicle_number'),
+            request.form.get('vehicle_brand'),
+            request.form.get('vehicle_model')
+        )
+    except BookingError as e:
+        flash(str(e), category='danger')
         return redirect(url_for('home_page'))
 
-    # Find a free spot in the lot
-    spot = ParkingSpot.query.filter_by(parking_lot_id=lot.id, status='free').first()
-    if not spot:
-        flash('No free spots available in this lot.', category='danger')
+    # Store spot number in session for modal popup
+    session['allocated_spot'] = booking.spot_id
+    session['allocated_lot'] = booking.spot.parking_lot.prime_location
+    return redirect(url_for('home_page'))
+
+
+@app.route('/reserve', methods=['POST'])
+def reserve():
+    if not current_user.is_authenticated:
+        flash('Please login to reserve a parking spot.', category='warning')
+        return redirect(url_for('login_page'))
+
+    form = ReservationForm()
+    if not form.validate_on_submit():
+        for field, errors in form.errors.items():
+            label = form[field].label.text if field in form else 'Form'
+            for error in errors:
+                flash(f'{label}: {error}', category='danger')
         return redirect(url_for('home_page'))
 
-    # Calculate cost as 1 hour for now (can be updated later)
-    cost = lot.price_per_hour
-    booking = Booking(
-        spot_id=spot.id,
-        user_id=current_user.id,
-        entry_time=datetime.now(),
-        exit_time=None,
-        vehicle_number=vehicle_number,
-        vehicle_brand=vehicle_brand,
-        vehicle_model=vehicle_model,
-        cost=cost
-    )
-    spot.status = 'occupied'
-    db.session.add(booking)
-    db.session.commit()
+    try:
+        reservation = booking_service.reserve(
+            current_user.id,
+            request.form.get('lot_id'),
+            form.start_time.data,
+            form.end_time.data,
+            form.vehicle_number.data,
+            form.vehicle_brand.data,
+            form.vehicle_model.data
+        )
+    except BookingError as e:
+        flash(str(e), category='danger')
+        return redirect(url_for('home_page'))
 
-    # Store spot number in session for modal popup
-    session['allocated_spot'] = spot.id
-    session['allocated_lot'] = lot.prime_location
+    flash(f'Spot {reservation.spot_id} reserved from {reservation.start_time:%Y-%m-%d %H:%M} '
+          f'to {reservation.end_time:%Y-%m-%d %H:%M}.', category='success')
     return redirect(url_for('home_page'))
 
 
+@app.route('/reservations/<int:reservation_id>/cancel', methods=['POST'])
+def cancel_reservation(reservation_id):
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Unauthorized.'}), 401
+    try:
+        booking_service.cancel_reservation(reservation_id, user_id=current_user.id)
+    except BookingError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True})
+
+
+@app.route('/reservations/<int:reservation_id>/check_in', methods=['POST'])
+def check_in_reservation(reservation_id):
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Unauthorized.'}), 401
+    try:
+        booking = booking_service.check_in(reservation_id, user_id=current_user.id)
+    except BookingError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True, 'booking_id': booking.id, 'spot_id': booking.spot_id})
+
+
+@app.route('/api/reservations/availability')
+def api_reservation_availability():
+    if not (current_user.is_authenticated or session.get('admin_logged_in')):
+        return jsonify({'error': 'Unauthorized.'}), 401
+    try:
+        start_time = datetime.fromisoformat(request.args.get('start', ''))
+        end_time = datetime.fromisoformat(request.args.get('end', ''))
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO date-times.'}), 400
+    if end_time <= start_time:
+        return jsonify({'error': 'end must be after start.'}), 400
+
+    lot_id = request.args.get('lot_id', type=int)
+    lot_ids = [lot_id] if lot_id is not None else db.session.scalars(select(ParkingLot.id)).all()
+    start_time, end_time = align(start_time, end_time)
+    free = reservation_index.free_by_lot(lot_ids, start_time, end_time)
+    return jsonify({
+        'start': start_time.isoformat(timespec='minutes'),
+        'end': end_time.isoformat(timespec='minutes'),
+        'lots': [{'lot_id': lot_id, 'free': count, 'spots': total} for lot_id, (count, total) in free.items()]
+    })
+
+
+@app.route('/api/lots/nearest')
+def api_nearest_lots():
+    if not (current_user.is_authenticated or session.get('admin_logged_in')):
+        return jsonify({'error': 'Unauthorized.'}), 401
+    try:
+        point = search_point(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if point is None:
+        return jsonify({'error': 'Give lat and lng, or a pincode.'}), 400
+    k = request.args.get('k', 5, type=int)
+    if not 1 <= k <= MAX_RESULTS:
+        return jsonify({'error': f'k must be between 1 and {MAX_RESULTS}.'}), 400
+
+    lots = lot_locator.nearest(*point, k, occupied_spots_by_lot)
+    return jsonify({
+        'lat': point[0],
+        'lng': point[1],
+        'lots': [{'lot_id': lot['id'], 'prime_location': lot['prime_location'], 'address': lot['address'],
+                  'pincode': lot['pincode'], 'lat': lot['latitude'], 'lng': lot['longitude'],
+                  'distance_km': lot['distance_km'], 'price_per_hour': lot['price_per_hour'],
+                  'free': lot['max_spots'] - lot['occupied_spots'], 'spots': lot['max_spots']} for lot in lots]
+    })
+
+
 @app.route('/release_spot/<int:booking_id>', methods=['POST'])
 def release_spot(booking_id):
-    booking = Booking.query.get(booking_id)
-    if not booking or booking.user_id != current_user.id:
-        return jsonify({'error': 'Invalid booking.'}), 400
-    if booking.exit_time is not None:
-        return jsonify({'error': 'Spot already released.'}), 400
-
-    exit_time = datetime.now()
-    entry_time = booking.entry_time
-    lot = ParkingLot.query.get(ParkingSpot.query.get(booking.spot_id).parking_lot_id)
-    price_per_hour = lot.price_per_hour if lot else 0
-    duration_seconds = (exit_time - entry_time).total_seconds()
-    duration_hours = max(1, int(duration_seconds // 3600))
-    total_cost = price_per_hour * duration_hours
+    try:
+        quote = booking_service.quote(booking_id, user_id=current_user.id)
+    except BookingError as e:
+        return jsonify({'error': str(e)}), 400
+
     # Format total time as H hours M minutes
+    duration_seconds = quote['duration_seconds']
     hours = int(duration_seconds // 3600)
     minutes = int((duration_seconds % 3600) // 60)
     total_time_str = f"{hours} hours {minutes} minutes" if hours else f"{minutes} minutes"
 
     # Return details for confirmation popup
     return jsonify({
-        'entry_time': entry_time.strftime('%Y-%m-%d %H:%M'),
-        'exit_time': exit_time.strftime('%Y-%m-%d %H:%M'),
-        'price_per_hour': price_per_hour,
-        'total_cost': total_cost,
+        'entry_time': quote['entry_time'].strftime('%Y-%m-%d %H:%M'),
+        'exit_time': quote['exit_time'].strftime('%Y-%m-%d %H:%M'),
+        'price_per_hour': quote['price_per_hour'],
+        'total_cost': quote['total_cost'],
         'total_time': total_time_str
     })
 
 
 @app.route('/pay_release/<int:booking_id>', methods=['POST'])
 def pay_release(booking_id):
-    booking = Booking.query.get(booking_id)
-    if not booking or booking.user_id != current_user.id or booking.exit_time is not None:
-        return jsonify({'error': 'Invalid booking.'}, 400)
-
-    exit_time = datetime.now()
-    entry_time = booking.entry_time
-    lot = ParkingLot.query.get(ParkingSpot.query.get(booking.spot_id).parking_lot_id)
-    price_per_hour = lot.price_per_hour if lot else 0
-    duration_hours = max(1, int((exit_time - entry_time).total_seconds() // 3600))
-    total_cost = price_per_hour * duration_hours
-    booking.exit_time = exit_time
-    booking.cost = total_cost
-    spot = ParkingSpot.query.get(booking.spot_id)
-    spot.status = 'free'
-    lot.revenue_per_lot += total_cost
-    db.session.commit()
+    try:
+        booking_service.release(booking_id, user_id=current_user.id)
+    except BookingError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({'success': True})
 
 
+@app.route('/events/occupancy')
+def occupancy_events():
+    if not (current_user.is_authenticated or session.get('admin_logged_in')):
+        return jsonify({'error': 'Unauthorized.'}), 401
+
+    position = occupancy_broker.subscribe()
+    # The stream stays open for as long as the dashboard does; don't hold a pooled connection for it
+    db.session.close()
+    return Response(occupancy_broker.stream(position), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+SPOT_GRID_PAGE_SIZE = 500
+
+
+@app.route('/admin/lot/<int:lot_id>/spots')
+def admin_lot_spots(lot_id):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized.'}), 401
+
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', SPOT_GRID_PAGE_SIZE, type=int), 1), SPOT_GRID_PAGE_SIZE)
+    if occupancy_engine.enabled:
+        total, spot_ids, status = occupancy_engine.grid(lot_id, offset, limit)
+    else:
+        total = db.session.query(func.count(ParkingSpot.id)).filter_by(parking_lot_id=lot_id).scalar()
+        rows = db.session.query(ParkingSpot.id, ParkingSpot.status).filter_by(parking_lot_id=lot_id) \
+            .order_by(ParkingSpot.id).offset(offset).limit(limit).all()
+        spot_ids = [spot_id for spot_id, _ in rows]
+        status = ''.join('1' if status == 'occupied' else '0' for _, status in rows)
+
+    # Spot ids as [first_id, length] runs (bulk-created spots are consecutive) and
+    # statuses as one character per spot: '1' occupied, '0' free
+    id_runs = []
+    for spot_id in spot_ids:
+        if id_runs and id_runs[-1][0] + id_runs[-1][1] == spot_id:
+            id_runs[-1][1] += 1
+        else:
+            id_runs.append([spot_id, 1])
+
+    return jsonify({
+        'lot_id': lot_id,
+        'total': total,
+        'offset': offset,
+        'ids': id_runs,
+        'status': status
+    })
+
+
 @app.route('/admin/spot_info/<int:spot_id>')
 def admin_spot_info(spot_id):
-    spot = ParkingSpot.query.get(spot_id)
-    if not spot:
-        return jsonify({'error': 'Spot not found.'}), 404
+    if occupancy_engine.enabled:
+        known = occupancy_engine.spot_status(spot_id)
+        if not known:
+            return jsonify({'error': 'Spot not found.'}), 404
+        lot_id, status = known
+        lot = db.session.get(ParkingLot, lot_id)
+    else:
+        spot = ParkingSpot.query.options(joinedload(ParkingSpot.parking_lot)).get(spot_id)
+        if not spot:
+            return jsonify({'error': 'Spot not found.'}), 404
+        lot, status = spot.parking_lot, spot.status
 
-    lot = ParkingLot.query.get(spot.parking_lot_id)
     if not lot:
         return jsonify({'error': 'Parking lot not found.'}), 404
 
-    booking = Booking.query.filter_by(spot_id=spot.id, exit_time=None).first()
+    booking = None
+    if status == 'occupied':
+        booking = Booking.query.options(joinedload(Booking.user)).filter_by(spot_id=spot_id, exit_time=None).first()
     booking_info = {}
     if booking:
-        user = User.query.get(booking.user_id)
+        user = booking.user
         booking_info = {
             'user_name': user.name if user else 'Unknown',
             'user_email': user.emailId if user else 'Unknown',
@@ -365,8 +744,8 @@ def admin_spot_info(spot_id):
             'max_spots': lot.max_spots
         },
         'spot': {
-            'id': spot.id,
-            'status': spot.status
+            'id': spot_id,
+            'status': status
         },
         'booking': booking_info
     })
@@ -378,33 +757,33 @@ def admin_user_summary():
         return redirect(url_for('login_page'))
 
     # Gather user stats
-    users = User.query.all()
-    total_users = len(users)
-
-    # Active bookings (exit_time is None)
-    active_bookings = Booking.query.filter_by(exit_time=None).count()
+    user_stats = booking_stats_per_user()
+    total_users = len(user_stats)
 
-    # Registered vehicles (count unique vehicle_number in Booking)
-    total_vehicles = len(set(b.vehicle_number for b in Booking.query.all()))
+    # Active bookings (exit_time is None) and registered vehicles (unique vehicle_number)
+    active_bookings, total_vehicles = db.session.query(
+        func.coalesce(func.sum(case((Booking.exit_time.is_(None), 1), else_=0)), 0),
+        func.count(distinct(Booking.vehicle_number))
+    ).one()
 
     # Bookings per user (bar chart)
-    bookings_user_labels = [u.name for u in users]
-    bookings_user_counts = [Booking.query.filter_by(user_id=u.id).count() for u in users]
+    bookings_user_labels = [u.name for u in user_stats]
+    bookings_user_counts = [u.booking_count for u in user_stats]
 
     # User table data
     user_table = []
-    for u in users:
+    for u in user_stats:
         user_table.append({
             'name': u.name,
             'email': u.emailId,
             'type': 'User',
-            'vehicle_count': len(set(b.vehicle_number for b in Booking.query.filter_by(user_id=u.id))),
-            'booking_count': Booking.query.filter_by(user_id=u.id).count()
+            'vehicle_count': u.vehicle_count,
+            'booking_count': u.booking_count
         })
 
     # Revenue and revenue per lot
-    total_revenue = sum(lot.revenue_per_lot for lot in ParkingLot.query.all())
-    revenue_per_lot = [(lot.prime_location, lot.revenue_per_lot) for lot in ParkingLot.query.all()]
+    revenue_per_lot = db.session.query(ParkingLot.prime_location, ParkingLot.revenue_per_lot).all()
+    total_revenue = sum(revenue for _, revenue in revenue_per_lot)
 
     return render_template(
         'admin_user_summary.html',
@@ -425,27 +804,15 @@ def bookings_bar_chart():
     if not session.get('admin_logged_in'):
         return redirect(url_for('login_page'))
 
-    users = User.query.all()
-    labels = [u.name if u.name else f"User {u.id}" for u in users]
-    counts = [Booking.query.filter_by(user_id=u.id).count() for u in users]
-
-    fig, ax = plt.subplots(figsize=(max(6, len(labels)), 4), facecolor='#343a40')
-    ax.bar(labels, counts, color='#17a2b8')
-    ax.set_xlabel('User', color='white')
-    ax.set_ylabel('Bookings', color='white')
-    ax.set_title('Bookings per User', color='white')
-    ax.tick_params(axis='x', rotation=45, labelcolor='white')
-    ax.tick_params(axis='y', labelcolor='white')
-    fig.patch.set_facecolor('#343a40')
-    ax.set_facecolor('#343a40')
-    for spine in ax.spines.values():
-        spine.set_color('white')
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    plt.close(fig)
-    buf.seek(0)
-    return make_response(buf.read(), 200, {'Content-Type': 'image/png'})
+    def load():
+        user_stats = booking_stats_per_user()
+        labels = [u.name if u.name else f"User {u.id}" for u in user_stats]
+        counts = [u.booking_count for u in user_stats]
+        return labels, counts
+
+    return chart_response('bookings_per_user', load, dict(
+        kind='bar', xlabel='User', ylabel='Bookings', title='Bookings per User', color='#17a2b8',
+        truncate='top'))
 
 
 @app.route('/admin/revenue_per_lot_chart')
@@ -453,42 +820,28 @@ def revenue_per_lot_chart():
     if not session.get('admin_logged_in'):
         return redirect(url_for('login_page'))
 
-    lots = ParkingLot.query.all()
-    labels = [lot.prime_location for lot in lots]
-    revenues = [lot.revenue_per_lot for lot in lots]
-
-    fig, ax = plt.subplots(figsize=(max(6, len(labels)), 4), facecolor='#343a40')
-    ax.bar(labels, revenues, color='#dc3545')
-    ax.set_xlabel('Lot', color='white')
-    ax.set_ylabel('Revenue (₹)', color='white')
-    ax.set_title('Revenue per Lot', color='white')
-    ax.tick_params(axis='x', rotation=45, labelcolor='white')
-    ax.tick_params(axis='y', labelcolor='white')
-    fig.patch.set_facecolor('#343a40')
-    ax.set_facecolor('#343a40')
-    for spine in ax.spines.values():
-        spine.set_color('white')
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    plt.close(fig)
-    buf.seek(0)
-    return make_response(buf.read(), 200, {'Content-Type': 'image/png'})
+    def load():
+        lots = revenue_per_lot_series()
+        labels = [prime_location for prime_location, _ in lots]
+        revenues = [revenue for _, revenue in lots]
+        return labels, revenues
+
+    return chart_response('revenue_per_lot', load, dict(
+        kind='bar', xlabel='Lot', ylabel='Revenue (₹)', title='Revenue per Lot', color='#dc3545',
+        truncate='top'))
 
 
 @app.route('/user/summary')
 @login_required
 def user_summary():
     user_id = current_user.id
-    bookings = Booking.query.filter_by(user_id=user_id).order_by(Booking.entry_time).all()
-    total_bookings = len(bookings)
-    active_bookings = sum(1 for b in bookings if b.exit_time is None)
-    total_spent = sum(b.cost for b in bookings if b.exit_time is not None)
+    bookings, next_cursor = booking_history_page(user_id, request.args.get('cursor'))
+    total_bookings, active_bookings, total_spent = booking_totals(user_id)
 
     # Prepare booking data for table
     booking_table = []
     for b in bookings:
-        lot = ParkingLot.query.get(ParkingSpot.query.get(b.spot_id).parking_lot_id) if b.spot_id else None
+        lot = b.spot.parking_lot if b.spot else None
         booking_table.append({
             'lot_name': lot.prime_location if lot else '-',
             'spot_id': b.spot_id,
@@ -505,7 +858,8 @@ def user_summary():
         total_bookings=total_bookings,
         active_bookings=active_bookings,
         total_spent=round(total_spent, 2),
-        bookings=booking_table
+        bookings=booking_table,
+        next_cursor=next_cursor
     )
 
 
@@ -513,60 +867,206 @@ def user_summary():
 @login_required
 def user_bookings_over_time_chart():
     user_id = current_user.id
-    bookings = Booking.query.filter_by(user_id=user_id).order_by(Booking.entry_time).all()
-
-    # Group by month
-    months = [b.entry_time.strftime('%Y-%m') for b in bookings if b.entry_time]
-    count_by_month = Counter(months)
-    sorted_months = sorted(count_by_month.keys())
-    counts = [count_by_month[m] for m in sorted_months]
-
-    fig, ax = plt.subplots(figsize=(max(6, len(sorted_months)), 4), facecolor='#343a40')
-    ax.plot(sorted_months, counts, marker='o', color='#ffc107')
-    ax.set_xlabel('Month', color='white')
-    ax.set_ylabel('Bookings', color='white')
-    ax.set_title('Bookings Over Time', color='white')
-    ax.tick_params(axis='x', rotation=45, labelcolor='white')
-    ax.tick_params(axis='y', labelcolor='white')
-    fig.patch.set_facecolor('#343a40')
-    ax.set_facecolor('#343a40')
-    for spine in ax.spines.values():
-        spine.set_color('white')
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    plt.close(fig)
-    buf.seek(0)
-    return make_response(buf.read(), 200, {'Content-Type': 'image/png'})
+
+    def load():
+        series = monthly_booking_series(user_id)
+        return [row.month for row in series], [row.bookings for row in series]
+
+    return chart_response('user_bookings_over_time', load, dict(
+        kind='line', xlabel='Month', ylabel='Bookings', title='Bookings Over Time', color='#ffc107',
+        truncate='recent'),
+        user_id=user_id)
 
 
 @app.route('/user/spending_over_time_chart')
 @login_required
 def user_spending_over_time_chart():
     user_id = current_user.id
-    bookings = Booking.query.filter_by(user_id=user_id).order_by(Booking.entry_time).all()
-    spending_by_month = defaultdict(float)
-    for b in bookings:
-        if b.entry_time and b.exit_time:
-            month = b.entry_time.strftime('%Y-%m')
-            spending_by_month[month] += b.cost
-    sorted_months = sorted(spending_by_month.keys())
-    spending = [spending_by_month[m] for m in sorted_months]
-
-    fig, ax = plt.subplots(figsize=(max(6, len(sorted_months)), 4), facecolor='#343a40')
-    ax.bar(sorted_months, spending, color='#28a745')
-    ax.set_xlabel('Month', color='white')
-    ax.set_ylabel('Spent (₹)', color='white')
-    ax.set_title('Spending Over Time', color='white')
-    ax.tick_params(axis='x', rotation=45, labelcolor='white')
-    ax.tick_params(axis='y', labelcolor='white')
-    fig.patch.set_facecolor('#343a40')
-    ax.set_facecolor('#343a40')
-    for spine in ax.spines.values():
-        spine.set_color('white')
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    plt.close(fig)
-    buf.seek(0)
-    return make_response(buf.read(), 200, {'Content-Type': 'image/png'})
\ No newline at end of file
+
+    def load():
+        series = [row for row in monthly_booking_series(user_id) if row.spending]
+        return [row.month for row in series], [row.spending for row in series]
+
+    return chart_response('user_spending_over_time', load, dict(
+        kind='bar', xlabel='Month', ylabel='Spent (₹)', title='Spending Over Time', color='#28a745',
+        truncate='recent'),
+        user_id=user_id)
+
+
+@app.route('/api/admin/bookings_per_user')
+def api_bookings_per_user():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized.'}), 401
+
+    def build():
+        user_stats = booking_stats_per_user()
+        return {
+            'labels': [u.name if u.name else f"User {u.id}" for u in user_stats],
+            'values': [u.booking_count for u in user_stats]
+        }
+
+    return series_response('bookings_per_user', build)
+
+
+@app.route('/api/admin/revenue_per_lot')
+def api_revenue_per_lot():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized.'}), 401
+
+    def build():
+        lots = revenue_per_lot_series()
+        return {
+            'labels': [prime_location for prime_location, _ in lots],
+            'values': [round(revenue, 2) for _, revenue in lots]
+        }
+
+    return series_response('revenue_per_lot', build)
+
+
+@app.route('/api/admin/revenue_per_day')
+def api_revenue_per_day():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized.'}), 401
+
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    lot_id = request.args.get('lot_id', type=int)
+    series = daily_revenue_series(days, lot_id)
+    return jsonify({
+        'labels': [day.isoformat() for day, _ in series],
+        'values': [round(revenue, 2) for _, revenue in series]
+    })
+
+
+@app.route('/admin/export/<kind>.<fmt>')
+def admin_export(kind, fmt):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized.'}), 401
+    if kind not in exports.EXPORTS or fmt not in exports.FORMATS:
+        return jsonify({'error': 'Export not found.'}), 404
+    try:
+        start = exports.parse_day(request.args.get('start'))
+        end = exports.parse_day(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'Dates must look like YYYY-MM-DD.'}), 400
+
+    # Rows are fetched and sent in chunks while the response streams, so memory stays flat
+    body = exports.export(kind, fmt, start, end, request.args.get('lot_id', type=int))
+    return Response(stream_with_context(body), mimetype=exports.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={kind}.{fmt}'})
+
+
+@app.route('/api/admin/cache_stats')
+def api_cache_stats():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized.'}), 401
+    return jsonify({'user_loader': user_cache.stats()})
+
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    if not session.get('admin_logged_in'):
+        return Response('Unauthorized.\n', status=401, mimetype='text/plain')
+    cache = user_cache.stats()
+    extra = [
+        ('parking_user_cache_hits_total', 'counter', 'User loader cache hits.', cache['hits']),
+        ('parking_user_cache_misses_total', 'counter', 'User loader cache misses.', cache['misses']),
+        ('parking_user_cache_entries', 'gauge', 'Identities held by the user loader cache.', cache['entries']),
+        ('parking_instrumentation_enabled', 'gauge', 'Whether per-request instrumentation is on.',
+         int(request_metrics.installed))
+    ]
+    return Response(request_metrics.prometheus(extra), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/admin/metrics/profiles')
+def admin_metrics_profiles():
+    if not session.get('admin_logged_in'):
+        return Response('Unauthorized.\n', status=401, mimetype='text/plain')
+    # Newest first; empty unless PROFILE_SAMPLE_RATE is set
+    reports = [f'=== {datetime.fromtimestamp(at):%Y-%m-%d %H:%M:%S} {endpoint} {duration * 1000:.1f} ms ===\n{text}'
+               for at, endpoint, duration, text in reversed(request_metrics.profiles)]
+    return Response('\n'.join(reports) or 'No profiles captured.\n', mimetype='text/plain')
+
+
+@app.route('/api/user/monthly')
+@login_required
+def api_user_monthly():
+    user_id = current_user.id
+
+    def build():
+        series = monthly_booking_series(user_id)
+        return {
+            'months': [row.month for row in series],
+            'bookings': [row.bookings for row in series],
+            'spending': [round(row.spending, 2) for row in series]
+        }
+
+    return series_response('user_monthly', build, user_id=user_id)
+
+
+@app.route('/api/user/bookings')
+@login_required
+def api_user_bookings():
+    limit = min(max(request.args.get('limit', BOOKINGS_PAGE_SIZE, type=int), 1), 100)
+    bookings, next_cursor = booking_history_page(current_user.id, request.args.get('cursor'), limit)
+    return jsonify({
+        'bookings': [{
+            'id': b.id,
+            'spot_id': b.spot_id,
+            'vehicle_number': b.vehicle_number,
+            'vehicle_brand': b.vehicle_brand,
+            'vehicle_model': b.vehicle_model,
+            'entry_time': b.entry_time.strftime('%Y-%m-%d %H:%M'),
+            'exit_time': b.exit_time.strftime('%Y-%m-%d %H:%M') if b.exit_time else None,
+            'cost': b.cost
+        } for b in bookings],
+        'next_cursor': next_cursor
+    })
+
+
+GATE_BATCH_LIMIT = 1000
+
+
+def gate_authorized():
+    if session.get('admin_logged_in'):
+        return True
+    key = app.config.get('GATE_API_KEY')
+    return bool(key) and hmac.compare_digest(request.headers.get('X-Gate-Key', ''), key)
+
+
+@app.route('/api/gate/batch', methods=['POST'])
+def api_gate_batch():
+    if not gate_authorized():
+        return jsonify({'error': 'Unauthorized.'}), 401
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object with exits and entries.'}), 400
+    exits = payload.get('exits') or []
+    entries = payload.get('entries') or []
+    if not isinstance(exits, list) or not isinstance(entries, list) \
+            or not all(isinstance(item, dict) for item in exits + entries):
+        return jsonify({'error': 'exits and entries must be lists of objects.'}), 400
+    if len(exits) + len(entries) > GATE_BATCH_LIMIT:
+        return jsonify({'error': f'At most {GATE_BATCH_LIMIT} events per batch.'}), 413
+
+    try:
+        exit_results, entry_results = booking_service.gate_batch(exits, entries)
+    except BookingError as e:
+        return jsonify({'error': str(e)}), 503
+
+    return jsonify({
+        'exits': [{'ok': False, 'error': str(result)} if isinstance(result, BookingError) else {
+            'ok': True,
+            'booking_id': result['booking_id'],
+            'lot_id': result['lot_id'],
+            'spot_id': result['spot_id'],
+            'exit_time': result['exit_time'].strftime('%Y-%m-%d %H:%M:%S'),
+            'total_cost': result['total_cost']
+        } for result in exit_results],
+        'entries': [{'ok': False, 'error': str(result)} if isinstance(result, BookingError) else {
+            'ok': True,
+            'booking_id': result.id,
+            'spot_id': result.spot_id,
+            'entry_time': result.entry_time.strftime('%Y-%m-%d %H:%M:%S')
+        } for result in entry_results]
+    })
@@ -0,0 +1,58 @@
+from sqlalchemy import event
+
+# PRAGMAs run on every new SQLite connection of a profile
+SQLITE_PRAGMAS = {
+    'default': {},
+    'tuned': {
+        # Readers keep working while a booking commits instead of waiting on it
+        'journal_mode': 'WAL',
+        # Safe with WAL: a power cut can lose the last commits but never corrupts the file
+        'synchronous': 'NORMAL',
+        # Wait for a competing writer instead of failing with "database is locked"
+        'busy_timeout': 5000,
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+}
+
+ENGINE_OPTIONS = {
+    'sqlite': {
+        'default': {},
+        'tuned': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 10},
+    },
+    'postgresql': {
+        'default': {'pool_pre_ping': True},
+        'tuned': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 10,
+                  'pool_pre_ping': True, 'pool_recycle': 1800},
+    },
+}
+
+
+def database_uri(url):
+    # Hosting providers hand out postgres:// URLs, which SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(uri, profile):
+    backend = 'sqlite' if uri.startswith('sqlite') else 'postgresql'
+    options = ENGINE_OPTIONS[backend]
+    if profile not in options:
+        raise ValueError(f'Unknown DB_PROFILE {profile!r}; expected one of {", ".join(options)}.')
+    return dict(options[profile])
+
+
+def configure_engine(engine, profile):
+    """Apply the profile's PRAGMAs to every connection a SQLite engine opens."""
+    pragmas = SQLITE_PRAGMAS.get(profile)
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
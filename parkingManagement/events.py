@@ -0,0 +1,66 @@
+import json
+import threading
+from collections import deque
+from itertools import islice
+
+
+class OccupancyBroker:
+    """In-process fan-out of occupancy deltas to connected dashboards.
+
+    Published events go into one shared ring buffer and every stream keeps
+    its own read position, so publishing costs the same regardless of how
+    many dashboards are connected. A stream that falls further behind than
+    the buffer holds is ended; its EventSource reconnects on its own. Only
+    events published by this process are seen, so multi-process deployments
+    need sticky sessions or a shared broker.
+    """
+
+    def __init__(self, buffer_size=1024):
+        self._events = deque(maxlen=buffer_size)
+        self._next_seq = 0
+        self._subscribers = 0
+        self._changed = threading.Condition()
+
+    def subscriber_count(self):
+        with self._changed:
+            return self._subscribers
+
+    def publish(self, **event):
+        message = json.dumps(event, separators=(',', ':'))
+        with self._changed:
+            self._events.append((self._next_seq, message))
+            self._next_seq += 1
+            self._changed.notify_all()
+
+    def subscribe(self):
+        # Returns the sequence number a new stream starts reading from
+        with self._changed:
+            return self._next_seq
+
+    def stream(self, position, keepalive=15):
+        # Server-Sent Events body; a comment line every keepalive seconds keeps proxies from timing out
+        with self._changed:
+            self._subscribers += 1
+        try:
+            while True:
+                with self._changed:
+                    self._changed.wait_for(lambda: self._next_seq > position, timeout=keepalive)
+                    if self._next_seq == position:
+                        messages = None
+                    elif not self._events or self._events[0][0] > position:
+                        return
+                    else:
+                        first = position - self._events[0][0]
+                        messages = [message for _, message in islice(self._events, first, None)]
+                        position = self._next_seq
+                if messages is None:
+                    yield ': keepalive\n\n'
+                    continue
+                for message in messages:
+                    yield f'data: {message}\n\n'
+        finally:
+            with self._changed:
+                self._subscribers -= 1
+
+
+occupancy_broker = OccupancyBroker()
@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+from sqlalchemy import select
+from parkingManagement import db
+from parkingManagement.modals import User, ParkingLot, ParkingSpot, Booking, LotDayRollup
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+BOOKING_COLUMNS = ['booking_id', 'user_id', 'username', 'user_name', 'user_email', 'lot_id', 'lot_name',
+                   'spot_id', 'vehicle_number', 'vehicle_brand', 'vehicle_model', 'entry_time', 'exit_time',
+                   'status', 'cost']
+REVENUE_COLUMNS = ['lot_id', 'lot_name', 'day', 'bookings', 'completed', 'revenue', 'occupied_hours']
+
+
+def parse_day(value):
+    # 'YYYY-MM-DD' or None; raises ValueError for anything else
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def booking_rows(start=None, end=None, lot_id=None):
+    """Booking rows joined with their user, spot and lot, oldest first.
+
+    ``start`` and ``end`` are inclusive entry dates.
+    """
+    query = select(
+        Booking.id, Booking.user_id, User.username, User.name, User.emailId,
+        ParkingLot.id, ParkingLot.prime_location, Booking.spot_id, Booking.vehicle_number,
+        Booking.vehicle_brand, Booking.vehicle_model, Booking.entry_time, Booking.exit_time, Booking.cost
+    ).join(User, User.id == Booking.user_id) \
+        .outerjoin(ParkingSpot, ParkingSpot.id == Booking.spot_id) \
+        .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.parking_lot_id)
+    if start:
+        query = query.where(Booking.entry_time >= datetime.combine(start, time.min))
+    if end:
+        query = query.where(Booking.entry_time < datetime.combine(end + timedelta(days=1), time.min))
+    if lot_id is not None:
+        query = query.where(ParkingSpot.parking_lot_id == lot_id)
+    query = query.order_by(Booking.entry_time, Booking.id)
+
+    for *fields, entry_time, exit_time, cost in _stream(query):
+        yield [*fields, entry_time.isoformat(sep=' ', timespec='seconds'),
+               exit_time.isoformat(sep=' ', timespec='seconds') if exit_time else None,
+               'completed' if exit_time else 'active', cost]
+
+
+def revenue_rows(start=None, end=None, lot_id=None):
+    """Per-lot daily revenue from the lot-day rollup, by lot and day."""
+    query = select(
+        LotDayRollup.lot_id, ParkingLot.prime_location, LotDayRollup.day, LotDayRollup.bookings,
+        LotDayRollup.completed, LotDayRollup.revenue, LotDayRollup.occupied_hours
+    ).join(ParkingLot, ParkingLot.id == LotDayRollup.lot_id)
+    if start:
+        query = query.where(LotDayRollup.day >= start)
+    if end:
+        query = query.where(LotDayRollup.day <= end)
+    if lot_id is not None:
+        query = query.where(LotDayRollup.lot_id == lot_id)
+    query = query.order_by(LotDayRollup.lot_id, LotDayRollup.day)
+
+    for row_lot_id, lot_name, day, bookings, completed, revenue, hours in _stream(query):
+        yield [row_lot_id, lot_name, day.isoformat(), bookings, completed, round(revenue, 2), round(hours, 2)]
+
+
+def _stream(query, chunk_size=1000):
+    # yield_per fetches chunk by chunk (a server-side cursor on Postgres) instead of buffering every row
+    return db.session.execute(query.execution_options(yield_per=chunk_size))
+
+
+def encode(rows, columns, fmt, chunk_size=1000):
+    """Turn rows into CSV or NDJSON text, yielded ``chunk_size`` rows at a time."""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(dict(zip(columns, row)), separators=(',', ':')))
+            if len(lines) == chunk_size:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+
+EXPORTS = {
+    'bookings': (booking_rows, BOOKING_COLUMNS),
+    'revenue': (revenue_rows, REVENUE_COLUMNS),
+}
+
+
+def export(kind, fmt, start=None, end=None, lot_id=None):
+    rows, columns = EXPORTS[kind]
+    return encode(rows(start, end, lot_id), columns, fmt)
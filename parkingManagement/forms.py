@@ -1,6 +1,7 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField, PasswordField, ValidationError, FloatField, IntegerField
-from wtforms.validators import DataRequired, Length, Email, EqualTo
+from wtforms import StringField, SubmitField, PasswordField, ValidationError, FloatField, IntegerField, \
+    DateTimeLocalField
+from wtforms.validators import DataRequired, Length, Email, EqualTo, Optional, NumberRange
 
 class RegistrationForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=3, max=30)])
@@ -35,10 +36,17 @@ class ParkingLotForm(FlaskForm):
     pincode = StringField('Pincode', validators=[DataRequired(), Length(max=10)])
     price_per_hour = FloatField('Price Per Hour', validators=[DataRequired()])
     max_spots = IntegerField('Max Spots', validators=[DataRequired()])
+    latitude = FloatField('Latitude', validators=[Optional(), NumberRange(min=-90, max=90)])
+    longitude = FloatField('Longitude', validators=[Optional(), NumberRange(min=-180, max=180)])
     submit = SubmitField('Create')
 
 class BookingForm(FlaskForm):
     vehicle_number = StringField('Vehicle Number', validators=[DataRequired(), Length(max=20)])
     vehicle_brand = StringField('Vehicle Brand', validators=[DataRequired(), Length(max=30)])
     vehicle_model = StringField('Vehicle Model', validators=[DataRequired(), Length(max=30)])
-    submit = SubmitField('Book')
\ No newline at end of file
+    submit = SubmitField('Book')
+
+class ReservationForm(BookingForm):
+    start_time = DateTimeLocalField('From', format='%Y-%m-%dT%H:%M', validators=[DataRequired()])
+    end_time = DateTimeLocalField('Until', format='%Y-%m-%dT%H:%M', validators=[DataRequired()])
+    submit = SubmitField('Reserve')
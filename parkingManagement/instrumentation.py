@@ -0,0 +1,154 @@
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Upper bounds, in seconds, of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class EndpointStats:
+    __slots__ = ('requests', 'duration', 'buckets', 'queries', 'sql_time', 'max_queries', 'flagged')
+
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = 0
+        self.sql_time = 0.0
+        self.max_queries = 0
+        self.flagged = 0
+
+
+class RequestMetrics:
+    """Per-endpoint wall time, SQL query count and SQL time (``INSTRUMENTATION=1``).
+
+    Queries are counted through engine events and charged to the request
+    running in the same thread. A request issuing more than
+    ``query_threshold`` statements is flagged as a likely N+1 and logged.
+    A ``profile_rate`` share of requests also runs under cProfile; the
+    newest reports are kept for ``/admin/metrics/profiles``.
+    """
+
+    def __init__(self, query_threshold=10, profile_rate=0.0, profiles_kept=20):
+        self.query_threshold = query_threshold
+        self.profile_rate = profile_rate
+        self.profiles = deque(maxlen=profiles_kept)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self.installed = False
+
+    def install(self, app, engine):
+        self.query_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', self.query_threshold)
+        self.profile_rate = app.config.get('PROFILE_SAMPLE_RATE', self.profile_rate)
+        self._logger = app.logger
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+        self.installed = True
+
+    def _start(self):
+        g.metrics = [time.perf_counter(), 0, 0.0]
+        if self.profile_rate and random.random() < self.profile_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another thread's profile is running; this request goes unprofiled
+                return
+            g.profiler = profiler
+
+    def _finish(self, exc):
+        metrics = g.pop('metrics', None)
+        profiler = g.pop('profiler', None)
+        if metrics is None:
+            return
+        duration = time.perf_counter() - metrics[0]
+        endpoint = request.endpoint or 'unmatched'
+        queries, sql_time = metrics[1], metrics[2]
+
+        if profiler:
+            profiler.disable()
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(30)
+            self.profiles.append((time.time(), endpoint, duration, report.getvalue()))
+
+        flagged = queries > self.query_threshold
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.requests += 1
+            stats.duration += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+            stats.queries += queries
+            stats.sql_time += sql_time
+            stats.max_queries = max(stats.max_queries, queries)
+            stats.flagged += flagged
+        if flagged:
+            self._logger.warning('Possible N+1: %s ran %d queries (threshold %d)',
+                                 endpoint, queries, self.query_threshold)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metrics' in g:
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_start')
+        if started and has_request_context() and 'metrics' in g:
+            g.metrics[1] += 1
+            g.metrics[2] += time.perf_counter() - started.pop()
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: (stats.requests, stats.duration, list(stats.buckets), stats.queries,
+                               stats.sql_time, stats.max_queries, stats.flagged)
+                    for endpoint, stats in self._endpoints.items()}
+
+    def prometheus(self, extra=()):
+        """Render every metric in the Prometheus text exposition format.
+
+        ``extra`` adds ``(name, type, help, value)`` samples without labels.
+        """
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+
+        family('parking_requests_total', 'counter', 'Requests handled per endpoint.',
+               [f'parking_requests_total{{endpoint="{e}"}} {s[0]}' for e, s in snapshot])
+        histogram = []
+        for endpoint, (count, total, buckets, *_) in snapshot:
+            for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                histogram.append(f'parking_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} '
+                                 f'{bucket_count}')
+            histogram.append(f'parking_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {count}')
+            histogram.append(f'parking_request_duration_seconds_sum{{endpoint="{endpoint}"}} {total:.6f}')
+            histogram.append(f'parking_request_duration_seconds_count{{endpoint="{endpoint}"}} {count}')
+        family('parking_request_duration_seconds', 'histogram', 'Wall time of requests per endpoint.', histogram)
+        family('parking_sql_queries_total', 'counter', 'SQL statements run by requests per endpoint.',
+               [f'parking_sql_queries_total{{endpoint="{e}"}} {s[3]}' for e, s in snapshot])
+        family('parking_sql_duration_seconds_total', 'counter', 'Time spent in SQL by requests per endpoint.',
+               [f'parking_sql_duration_seconds_total{{endpoint="{e}"}} {s[4]:.6f}' for e, s in snapshot])
+        family('parking_sql_queries_max', 'gauge', 'Most SQL statements a single request of the endpoint ran.',
+               [f'parking_sql_queries_max{{endpoint="{e}"}} {s[5]}' for e, s in snapshot])
+        family('parking_n_plus_one_requests_total', 'counter',
+               f'Requests that ran more than {self.query_threshold} SQL statements.',
+               [f'parking_n_plus_one_requests_total{{endpoint="{e}"}} {s[6]}' for e, s in snapshot])
+        for name, kind, help_text, value in extra:
+            family(name, kind, help_text, [f'{name} {value}'])
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,182 @@
+import heapq
+import math
+import threading
+import time
+from sqlalchemy import select
+from parkingManagement import db
+from parkingManagement.modals import ParkingLot
+
+# Kilometres per degree of latitude, and of longitude at the equator
+KM_PER_DEGREE = 111.195
+# Most lots a single search returns
+MAX_RESULTS = 50
+
+
+class LotTree:
+    """Lots with coordinates in a KD-tree over a flat map.
+
+    Coordinates are projected to kilometres around the lots' mean latitude
+    (equirectangular), which is accurate to well under a percent across a
+    city. Each node splits its lots at the median of the wider axis, down
+    to leaves of ``leaf_size`` lots, and keeps their bounding box; a search
+    visits the nearer child first and skips any node whose box is further
+    away than the k-th free lot found so far.
+    """
+
+    __slots__ = ('lots', 'points', 'scale', 'root', 'centroids', 'loaded_at')
+
+    def __init__(self, lots, loaded_at=0.0, leaf_size=8):
+        # lots: (id, prime_location, address, pincode, price_per_hour, max_spots, latitude, longitude) rows
+        self.lots = lots
+        self.loaded_at = loaded_at
+        self.scale = KM_PER_DEGREE
+        if lots:
+            self.scale *= math.cos(math.radians(sum(lot[6] for lot in lots) / len(lots)))
+        self.points = [(lot[7] * self.scale, lot[6] * KM_PER_DEGREE) for lot in lots]
+        self.root = self._build(list(range(len(lots))), leaf_size)
+
+        # A pincode is located at the mean position of its lots
+        sums = {}
+        for lot in lots:
+            count, latitude, longitude = sums.get(lot[3], (0, 0.0, 0.0))
+            sums[lot[3]] = (count + 1, latitude + lot[6], longitude + lot[7])
+        self.centroids = {pincode: (latitude / count, longitude / count)
+                          for pincode, (count, latitude, longitude) in sums.items()}
+
+    def nearest(self, latitude, longitude, k, occupied):
+        """The ``k`` nearest lots with a free spot as ``(distance_km, lot, free)``, closest first.
+
+        ``occupied`` maps lot ids to their occupied spot counts.
+        """
+        if k <= 0:
+            return []
+        qx, qy = longitude * self.scale, latitude * KM_PER_DEGREE
+        lots, points = self.lots, self.points
+        # Max-heap of the best k so far, as (-squared distance, index)
+        best = []
+        # Nodes still to visit, each with the squared distance to its bounding box
+        pending = [(self.root, 0.0)]
+        while pending:
+            node, bound = pending.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            children, indices, _ = node
+            if children is None:
+                for i in indices:
+                    lot = lots[i]
+                    if lot[5] - occupied.get(lot[0], 0) <= 0:
+                        continue
+                    x, y = points[i]
+                    distance = (x - qx) * (x - qx) + (y - qy) * (y - qy)
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, i))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, i))
+                continue
+            low, high = children
+            low_bound, high_bound = self._distance(low, qx, qy), self._distance(high, qx, qy)
+            # The further child goes on the stack first so the nearer one is searched before it
+            if low_bound <= high_bound:
+                pending.append((high, high_bound))
+                pending.append((low, low_bound))
+            else:
+                pending.append((low, low_bound))
+                pending.append((high, high_bound))
+        return [(math.sqrt(-distance), lots[i], lots[i][5] - occupied.get(lots[i][0], 0))
+                for distance, i in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _distance(node, qx, qy):
+        min_x, min_y, max_x, max_y = node[2]
+        dx = min_x - qx if qx < min_x else qx - max_x if qx > max_x else 0.0
+        dy = min_y - qy if qy < min_y else qy - max_y if qy > max_y else 0.0
+        return dx * dx + dy * dy
+
+    def _build(self, indices, leaf_size):
+        # Nodes are (None, indices, box) for leaves and ((low, high), None, box) otherwise,
+        # box being the (min_x, min_y, max_x, max_y) of the node's lots
+        xs = [self.points[i][0] for i in indices]
+        ys = [self.points[i][1] for i in indices]
+        box = (min(xs, default=0.0), min(ys, default=0.0), max(xs, default=0.0), max(ys, default=0.0))
+        if len(indices) <= leaf_size:
+            return None, indices, box
+        axis = 0 if box[2] - box[0] >= box[3] - box[1] else 1
+        indices.sort(key=lambda i: self.points[i][axis])
+        middle = len(indices) // 2
+        return (self._build(indices[:middle], leaf_size), self._build(indices[middle:], leaf_size)), None, box
+
+
+class LotLocator:
+    """Nearest lots with free spots, from an in-memory LotTree.
+
+    The tree is rebuilt on the first search after ``invalidate`` (called
+    whenever a lot is created, edited or deleted) or once it is ``ttl``
+    seconds old, which brings in other processes' changes. Occupied counts
+    are cached for ``occupancy_ttl`` seconds, so a search never touches the
+    database while both are fresh; the free counts it reports can be that
+    stale, and booking still claims spots atomically.
+    """
+
+    def __init__(self, ttl=300, occupancy_ttl=5):
+        self.ttl = ttl
+        self.occupancy_ttl = occupancy_ttl
+        self._tree = None
+        # (loaded_at, {lot_id: occupied})
+        self._occupied = None
+        self._lock = threading.Lock()
+
+    def nearest(self, latitude, longitude, k, load_occupied):
+        """Up to ``k`` lot dicts, closest first; ``load_occupied`` returns ``{lot_id: occupied}``."""
+        tree = self._current_tree()
+        occupied = self._current_occupied(load_occupied)
+        return [{
+            'id': lot[0],
+            'prime_location': lot[1],
+            'address': lot[2],
+            'pincode': lot[3],
+            'price_per_hour': lot[4],
+            'max_spots': lot[5],
+            'occupied_spots': lot[5] - free,
+            'latitude': lot[6],
+            'longitude': lot[7],
+            'distance_km': round(distance, 2)
+        } for distance, lot, free in tree.nearest(latitude, longitude, min(k, MAX_RESULTS), occupied)]
+
+    def locate(self, pincode):
+        """``(latitude, longitude)`` of a pincode, or None when none of its lots has coordinates."""
+        return self._current_tree().centroids.get(pincode)
+
+    def invalidate(self):
+        with self._lock:
+            self._tree = None
+            self._occupied = None
+
+    def _current_tree(self):
+        now = time.monotonic()
+        tree = self._tree
+        if tree is not None and now - tree.loaded_at < self.ttl:
+            return tree
+        tree = LotTree(self._load(), now)
+        with self._lock:
+            self._tree = tree
+        return tree
+
+    def _current_occupied(self, load_occupied):
+        now = time.monotonic()
+        cached = self._occupied
+        if cached is not None and now - cached[0] < self.occupancy_ttl:
+            return cached[1]
+        occupied = load_occupied()
+        with self._lock:
+            self._occupied = (now, occupied)
+        return occupied
+
+    def _load(self):
+        return db.session.execute(
+            select(ParkingLot.id, ParkingLot.prime_location, ParkingLot.address, ParkingLot.pincode,
+                   ParkingLot.price_per_hour, ParkingLot.max_spots, ParkingLot.latitude, ParkingLot.longitude)
+            .where(ParkingLot.latitude.is_not(None), ParkingLot.longitude.is_not(None))
+        ).all()
+
+
+lot_locator = LotLocator()
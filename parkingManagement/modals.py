@@ -1,10 +1,20 @@
 from parkingManagement import db, login_manager
 from parkingManagement import bcrypt 
+from parkingManagement.user_cache import user_cache, UserIdentity
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+
+    def load():
+        row = db.session.query(User.id, User.username, User.name, User.emailId, User.pincode) \
+            .filter_by(id=user_id).first()
+        return UserIdentity(*row) if row else None
+
+    return user_cache.get(user_id, load)
 
 
 class User(db.Model, UserMixin):
@@ -38,13 +48,41 @@ class ParkingLot(db.Model):
     price_per_hour = db.Column(db.Float(), nullable=False)
     max_spots = db.Column(db.Integer(), nullable=False)
     revenue_per_lot = db.Column(db.Float(), nullable=False)
+    # WGS84 degrees; lots without coordinates are left out of the nearest-lot search
+    latitude = db.Column(db.Float(), nullable=True)
+    longitude = db.Column(db.Float(), nullable=True)
+
+    spots = db.relationship('ParkingSpot', back_populates='parking_lot', passive_deletes=True)
+    tariff = db.relationship('Tariff', uselist=False, passive_deletes=True)
+
+class Tariff(db.Model):
+    # Peak hours, daily cap and grace period of a lot; a lot without one bills price_per_hour for every hour
+    lot_id = db.Column(db.Integer(), db.ForeignKey('parking_lot.id'), primary_key=True)
+    peak_rate = db.Column(db.Float(), nullable=True)
+    # Hours of the day, peak_start inclusive and peak_end exclusive; the window may wrap past midnight
+    peak_start = db.Column(db.Integer(), nullable=False, default=0)
+    peak_end = db.Column(db.Integer(), nullable=False, default=0)
+    daily_cap = db.Column(db.Float(), nullable=True)
+    grace_minutes = db.Column(db.Integer(), nullable=False, default=0)
 
 class ParkingSpot(db.Model):
+    __table_args__ = (
+        db.Index('ix_parking_spot_lot_status', 'parking_lot_id', 'status'),
+    )
+
     id = db.Column(db.Integer(), primary_key=True)
     parking_lot_id = db.Column(db.Integer(), db.ForeignKey('parking_lot.id'), nullable=False)
     status = db.Column(db.String(length=20), nullable=False)
 
+    parking_lot = db.relationship('ParkingLot', back_populates='spots')
+
 class Booking(db.Model):
+    __table_args__ = (
+        db.Index('ix_booking_user_entry', 'user_id', 'entry_time'),
+        db.Index('ix_booking_spot_exit', 'spot_id', 'exit_time'),
+        db.Index('ix_booking_entry_time', 'entry_time'),
+    )
+
     id = db.Column(db.Integer(), primary_key=True)
     spot_id = db.Column(db.Integer(), db.ForeignKey('parking_spot.id'), nullable=False)
     user_id = db.Column(db.Integer(), db.ForeignKey('user.id'), nullable=False)
@@ -55,3 +93,65 @@ class Booking(db.Model):
     vehicle_model = db.Column(db.String(length=30), nullable=False)
     cost = db.Column(db.Float(), nullable=False)
 
+    spot = db.relationship('ParkingSpot')
+    user = db.relationship('User')
+
+class Reservation(db.Model):
+    # A spot held for a future window; times sit on reservation slot boundaries
+    __table_args__ = (
+        db.Index('ix_reservation_lot_end', 'lot_id', 'end_time'),
+        db.Index('ix_reservation_spot_start', 'spot_id', 'start_time'),
+        db.Index('ix_reservation_user_start', 'user_id', 'start_time'),
+    )
+
+    id = db.Column(db.Integer(), primary_key=True)
+    lot_id = db.Column(db.Integer(), db.ForeignKey('parking_lot.id'), nullable=False)
+    spot_id = db.Column(db.Integer(), db.ForeignKey('parking_spot.id'), nullable=False)
+    user_id = db.Column(db.Integer(), db.ForeignKey('user.id'), nullable=False)
+    start_time = db.Column(db.DateTime(), nullable=False)
+    end_time = db.Column(db.DateTime(), nullable=False)
+    vehicle_number = db.Column(db.String(length=20), nullable=False)
+    vehicle_brand = db.Column(db.String(length=30), nullable=False)
+    vehicle_model = db.Column(db.String(length=30), nullable=False)
+    # 'reserved', 'checked_in' or 'cancelled'
+    status = db.Column(db.String(length=20), nullable=False)
+    booking_id = db.Column(db.Integer(), db.ForeignKey('booking.id'), nullable=True)
+
+    lot = db.relationship('ParkingLot')
+
+
+class UserMonthRollup(db.Model):
+    # Bookings of a user per entry month; completed ones add their spend and hours on release
+    user_id = db.Column(db.Integer(), db.ForeignKey('user.id'), primary_key=True)
+    month = db.Column(db.String(length=7), primary_key=True)
+    bookings = db.Column(db.Integer(), nullable=False, default=0)
+    completed = db.Column(db.Integer(), nullable=False, default=0)
+    spend = db.Column(db.Float(), nullable=False, default=0.0)
+    occupied_hours = db.Column(db.Float(), nullable=False, default=0.0)
+
+class LotDayRollup(db.Model):
+    # Bookings of a lot per entry day; completed ones add their revenue and hours on release
+    lot_id = db.Column(db.Integer(), db.ForeignKey('parking_lot.id'), primary_key=True)
+    day = db.Column(db.Date(), primary_key=True)
+    bookings = db.Column(db.Integer(), nullable=False, default=0)
+    completed = db.Column(db.Integer(), nullable=False, default=0)
+    revenue = db.Column(db.Float(), nullable=False, default=0.0)
+    occupied_hours = db.Column(db.Float(), nullable=False, default=0.0)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def track_changed_user(mapper, connection, target):
+    # Until the transaction commits other requests still read, and may cache, the old row
+    object_session(target).info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_cached_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
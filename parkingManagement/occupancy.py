@@ -0,0 +1,267 @@
+import atexit
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from sqlalchemy import case, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from parkingManagement import app, db
+from parkingManagement.modals import ParkingSpot, Booking
+
+FREE = 0
+OCCUPIED = 1
+STATUS_NAMES = ('free', 'occupied')
+# bytes.translate table turning a lot's state bytes into the '0'/'1' grid string
+GRID_CHARS = bytes.maketrans(b'\x00\x01', b'01')
+
+
+def reconcile_spot_status():
+    """Set every ParkingSpot.status from whether the spot has an open booking.
+
+    Runs in the session's transaction; returns the number of spots changed.
+    """
+    open_booking = select(Booking.id) \
+        .where(Booking.spot_id == ParkingSpot.id, Booking.exit_time.is_(None)).exists()
+    actual = case((open_booking, 'occupied'), else_='free')
+    return db.session.execute(update(ParkingSpot).where(ParkingSpot.status != actual).values(status=actual)
+                              .execution_options(synchronize_session=False)).rowcount
+
+
+class LotState:
+    """Spot ids of one lot in ascending order with one state byte per spot."""
+
+    __slots__ = ('ids', 'states', 'occupied', 'runs')
+
+    def __init__(self, ids, states):
+        self.ids = ids
+        self.states = states
+        self.occupied = states.count(OCCUPIED)
+        # [first_id, length, position] per run of consecutive ids; bulk-created
+        # spots are consecutive, so a lot is usually a handful of runs
+        self.runs = []
+        for pos, spot_id in enumerate(ids):
+            if pos and spot_id == ids[pos - 1] + 1:
+                self.runs[-1][1] += 1
+            else:
+                self.runs.append([spot_id, 1, pos])
+
+    def position(self, spot_id):
+        pos = bisect_left(self.ids, spot_id)
+        if pos < len(self.ids) and self.ids[pos] == spot_id:
+            return pos
+        return None
+
+
+class OccupancyEngine:
+    """Optional in-process owner of spot occupancy (``OCCUPANCY_ENGINE=1``).
+
+    Spot states live in memory as a byte per spot, so occupancy counts,
+    spot grids and spot lookups never touch the database, and spots are
+    claimed under a lock instead of a conditional UPDATE. Status changes
+    reach ``ParkingSpot`` in write-behind batches from a background thread.
+    Bookings are still committed synchronously and remain the record of
+    truth: on startup every spot status is recomputed from the open
+    bookings, which repairs whatever a crash left unwritten. Claims are
+    only exclusive within one process, so run a single worker process.
+    """
+
+    def __init__(self, flush_interval=0.5, batch_size=500):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        # Held from taking a batch of pending statuses until it is committed
+        self._flush_lock = threading.Lock()
+        self._lots = None
+        self._runs = []
+        self._run_starts = []
+        self._dirty = {}
+        self._wakeup = threading.Event()
+
+    @property
+    def enabled(self):
+        return app.config.get('OCCUPANCY_ENGINE', False)
+
+    def ensure_loaded(self):
+        """Rebuild the state from the database once, then start the flusher.
+
+        Runs at the start of a request, before the session has opened a
+        transaction of its own.
+        """
+        with self._lock:
+            if self._lots is not None:
+                return
+            self._rebuild()
+        threading.Thread(target=self._run_flusher, name='occupancy-flush', daemon=True).start()
+        atexit.register(self._flush_at_exit)
+
+    def claim(self, lot_id, exclude=(), prefer=None):
+        """Mark a free spot of the lot occupied and return its id, or None.
+
+        Takes ``prefer`` if it is free, else the lowest free spot not in ``exclude``.
+        """
+        with self._lock:
+            lot = self._lots.get(lot_id)
+            if not lot:
+                return None
+            pos = lot.position(prefer) if prefer is not None else None
+            if pos is None or lot.states[pos] != FREE:
+                pos = lot.states.find(FREE)
+                while pos >= 0 and lot.ids[pos] in exclude:
+                    pos = lot.states.find(FREE, pos + 1)
+                if pos < 0:
+                    return None
+            lot.states[pos] = OCCUPIED
+            lot.occupied += 1
+            spot_id = lot.ids[pos]
+            self._mark(spot_id, OCCUPIED)
+        return spot_id
+
+    def release(self, lot_id, spot_id):
+        """Mark a spot free again, after a release or a rolled-back claim."""
+        with self._lock:
+            lot = self._lots.get(lot_id)
+            pos = lot.position(spot_id) if lot else None
+            if pos is None or lot.states[pos] == FREE:
+                return
+            lot.states[pos] = FREE
+            lot.occupied -= 1
+            self._mark(spot_id, FREE)
+
+    def occupied_by_lot(self):
+        with self._lock:
+            return {lot_id: lot.occupied for lot_id, lot in self._lots.items() if lot.occupied}
+
+    def grid(self, lot_id, offset, limit):
+        """Return ``(total, spot_ids, status)`` for a page of the lot's spot grid."""
+        with self._lock:
+            lot = self._lots.get(lot_id)
+            if not lot:
+                return 0, [], ''
+            return (len(lot.ids), lot.ids[offset:offset + limit].tolist(),
+                    lot.states[offset:offset + limit].translate(GRID_CHARS).decode())
+
+    def spot_status(self, spot_id):
+        """Return ``(lot_id, status)`` of a spot, or None if there is no such spot."""
+        with self._lock:
+            i = bisect_right(self._run_starts, spot_id) - 1
+            if i < 0:
+                return None
+            start, length, lot_id, offset = self._runs[i]
+            if spot_id >= start + length:
+                return None
+            return lot_id, STATUS_NAMES[self._lots[lot_id].states[offset + spot_id - start]]
+
+    @contextmanager
+    def updating_lot(self, lot_id):
+        """Hold claims while spots of a lot are added or removed in the session.
+
+        Waits for a flush in progress to commit, then writes the remaining
+        pending statuses into the surrounding transaction, so deleting 'free'
+        rows can never pick a spot that is occupied in memory. The lot is
+        reloaded afterwards; spots that still exist keep their in-memory
+        state. A no-op while the engine is off.
+        """
+        if not self.enabled or self._lots is None:
+            yield
+            return
+        with self._flush_lock, self._lock:
+            self._write(dict(self._dirty))
+            try:
+                yield
+            finally:
+                self._load([lot_id])
+
+    def flush(self):
+        """Write pending status changes to ``ParkingSpot`` in one batch."""
+        # Claims go on while the batch is written; only updating_lot has to wait for it
+        with self._flush_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, {}
+            if not pending:
+                return
+            try:
+                self._write(pending)
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                with self._lock:
+                    # Keep anything that changed again in the meantime
+                    for spot_id, status in pending.items():
+                        self._dirty.setdefault(spot_id, status)
+                raise
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._dirty)
+
+    def _mark(self, spot_id, state):
+        self._dirty[spot_id] = STATUS_NAMES[state]
+        if len(self._dirty) >= self.batch_size:
+            self._wakeup.set()
+
+    def _write(self, pending):
+        if pending:
+            db.session.execute(update(ParkingSpot), [
+                {'id': spot_id, 'status': status} for spot_id, status in pending.items()
+            ])
+
+    def _rebuild(self):
+        reconcile_spot_status()
+        db.session.commit()
+        self._lots = {}
+        self._load(None)
+
+    def _load(self, lot_ids):
+        # lot_ids None loads every lot
+        query = select(ParkingSpot.parking_lot_id, ParkingSpot.id, ParkingSpot.status) \
+            .order_by(ParkingSpot.parking_lot_id, ParkingSpot.id)
+        if lot_ids is not None:
+            query = query.where(ParkingSpot.parking_lot_id.in_(lot_ids))
+        loaded = {}
+        for lot_id, spot_id, status in db.session.execute(query):
+            ids, states = loaded.setdefault(lot_id, (array('q'), bytearray()))
+            ids.append(spot_id)
+            states.append(OCCUPIED if status == 'occupied' else FREE)
+
+        for lot_id in (lot_ids if lot_ids is not None else loaded):
+            old = self._lots.pop(lot_id, None)
+            if lot_id not in loaded:
+                if old:
+                    self._forget_dirty(old.ids)
+                continue
+            ids, states = loaded[lot_id]
+            if old:
+                # The database may lag behind memory; memory wins for spots that survived
+                for pos, spot_id in enumerate(ids):
+                    old_pos = old.position(spot_id)
+                    if old_pos is not None:
+                        states[pos] = old.states[old_pos]
+                self._forget_dirty(set(old.ids).difference(ids))
+            self._lots[lot_id] = LotState(ids, states)
+        self._index_runs()
+
+    def _forget_dirty(self, spot_ids):
+        for spot_id in spot_ids:
+            self._dirty.pop(spot_id, None)
+
+    def _index_runs(self):
+        self._runs = sorted((start, length, lot_id, pos)
+                            for lot_id, lot in self._lots.items() for start, length, pos in lot.runs)
+        self._run_starts = [run[0] for run in self._runs]
+
+    def _run_flusher(self):
+        with app.app_context():
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                try:
+                    self.flush()
+                except SQLAlchemyError:
+                    app.logger.exception('Writing spot statuses failed; retrying')
+
+    def _flush_at_exit(self):
+        with app.app_context():
+            self.flush()
+
+
+occupancy_engine = OccupancyEngine()
@@ -0,0 +1,165 @@
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from parkingManagement import db
+from parkingManagement.modals import ParkingLot, ParkingSpot, Booking
+
+
+class TariffSchedule:
+    """How a lot bills a stay.
+
+    Every stay pays at least one hour and after that whole hours. An hour
+    that starts within ``[peak_start, peak_end)`` (hours of the day; the
+    window may wrap past midnight) is billed at ``peak_rate``, any other
+    at ``base_rate``. ``daily_cap`` limits what each 24 hours counted from
+    entry can cost, and stays no longer than ``grace_minutes`` are free.
+    Without a peak rate, cap or grace period this is the plain hourly rate.
+    """
+
+    __slots__ = ('base_rate', 'peak_rate', 'peak_start', 'peak_end', 'daily_cap', 'grace_minutes', 'peak_hours')
+
+    def __init__(self, base_rate, peak_rate=None, peak_start=0, peak_end=0, daily_cap=None, grace_minutes=0):
+        self.base_rate = base_rate
+        self.peak_rate = peak_rate
+        self.peak_start = peak_start
+        self.peak_end = peak_end
+        self.daily_cap = daily_cap
+        self.grace_minutes = grace_minutes
+        # 1 for every hour of the day billed at the peak rate
+        if peak_rate is None:
+            self.peak_hours = [0] * 24
+        elif peak_start <= peak_end:
+            self.peak_hours = [int(peak_start <= hour < peak_end) for hour in range(24)]
+        else:
+            self.peak_hours = [int(hour >= peak_start or hour < peak_end) for hour in range(24)]
+
+    @classmethod
+    def for_lot(cls, lot):
+        tariff = lot.tariff
+        if tariff is None:
+            return cls(lot.price_per_hour)
+        return cls(lot.price_per_hour, tariff.peak_rate, tariff.peak_start, tariff.peak_end, tariff.daily_cap,
+                   tariff.grace_minutes)
+
+    def replace(self, **changes):
+        """A copy of the schedule with some parameters changed."""
+        params = {name: getattr(self, name) for name in self.__slots__ if name != 'peak_hours'}
+        params.update(changes)
+        return TariffSchedule(**params)
+
+    def quote(self, entry_time, exit_time):
+        seconds = (exit_time - entry_time).total_seconds()
+        if self.grace_minutes and seconds <= self.grace_minutes * 60:
+            return 0.0
+        hours = max(1, int(seconds // 3600))
+        days, rest = divmod(hours, 24)
+        peak_rest = sum(self.peak_hours[(entry_time.hour + i) % 24] for i in range(rest))
+        if self.daily_cap is None:
+            return self._charge(days * sum(self.peak_hours) + peak_rest, hours)
+        # Every full 24 hours from entry spans the same hours of the day, so they all cost the same
+        cost = days * min(self._charge(sum(self.peak_hours), 24), self.daily_cap)
+        if rest:
+            cost += min(self._charge(peak_rest, rest), self.daily_cap)
+        return cost
+
+    def _charge(self, peak, hours):
+        return (hours - peak) * self.base_rate + (peak * self.peak_rate if peak else 0.0)
+
+
+def quote(lot, entry_time, exit_time):
+    # A booking whose lot is gone costs nothing
+    return TariffSchedule.for_lot(lot).quote(entry_time, exit_time) if lot else 0.0
+
+
+def quote_batch(schedules, lot_ids, entry_times, exit_times):
+    """Quote many stays at once; returns a float64 array of costs.
+
+    ``schedules`` maps lot ids to TariffSchedules; ``lot_ids`` is an integer
+    array and the times are datetime64 arrays of the same length. Stays in
+    lots missing from ``schedules`` cost nothing. Each cost equals what
+    ``TariffSchedule.quote`` gives for that stay.
+    """
+    # NumPy is imported on first use, so web workers that only quote single stays skip it
+    import numpy as np
+
+    lot_ids = np.asarray(lot_ids, dtype=np.int64)
+    entry_times = np.asarray(entry_times, dtype='datetime64[us]')
+    exit_times = np.asarray(exit_times, dtype='datetime64[us]')
+    if not len(lot_ids):
+        return np.zeros(0)
+
+    # One row of tariff parameters per distinct lot; row 0 is the free schedule of unknown lots
+    known, index = np.unique(lot_ids, return_inverse=True)
+    rows = [TariffSchedule(0.0)] + [schedules.get(int(lot_id)) or TariffSchedule(0.0) for lot_id in known]
+    index = index + 1
+    index[~np.isin(lot_ids, list(schedules))] = 0
+    base = np.array([s.base_rate for s in rows], dtype=np.float64)[index]
+    peak = np.array([s.peak_rate or 0.0 for s in rows], dtype=np.float64)[index]
+    cap = np.array([np.inf if s.daily_cap is None else s.daily_cap for s in rows], dtype=np.float64)[index]
+    capped = np.array([s.daily_cap is not None for s in rows])[index]
+    grace = np.array([s.grace_minutes * 60 for s in rows], dtype=np.float64)[index]
+    # peak_before[r, h]: peak hours among the h hours from midnight, over two days so windows can wrap
+    peak_before = np.zeros((len(rows), 49), dtype=np.int64)
+    peak_before[:, 1:] = np.cumsum(np.array([s.peak_hours * 2 for s in rows], dtype=np.int64), axis=1)
+
+    seconds = (exit_times - entry_times) / np.timedelta64(1, 's')
+    hours = np.maximum(1, (seconds // 3600).astype(np.int64))
+    days, rest = np.divmod(hours, 24)
+    first = ((entry_times - entry_times.astype('datetime64[D]')) // np.timedelta64(1, 'h')).astype(np.int64)
+    day_peak = peak_before[index, 24]
+    peak_rest = peak_before[index, first + rest] - peak_before[index, first]
+
+    def charge(peak_count, count):
+        return (count - peak_count) * base + np.where(peak_count > 0, peak_count * peak, 0.0)
+
+    uncapped = charge(days * day_peak + peak_rest, hours)
+    capped_cost = days * np.minimum(charge(day_peak, 24), cap) + \
+        np.where(rest > 0, np.minimum(charge(peak_rest, rest), cap), 0.0)
+    cost = np.where(capped, capped_cost, uncapped)
+    return np.where((grace > 0) & (seconds <= grace), 0.0, cost)
+
+
+def lot_schedules(lot_ids=None):
+    """``{lot_id: TariffSchedule}`` for the given lots, or every lot."""
+    query = ParkingLot.query.options(joinedload(ParkingLot.tariff))
+    if lot_ids is not None:
+        query = query.filter(ParkingLot.id.in_(lot_ids))
+    return {lot.id: TariffSchedule.for_lot(lot) for lot in query}
+
+
+def completed_bookings(lot_id=None, chunk_size=100000):
+    """Yield ``(lot_ids, entry_times, exit_times, costs)`` arrays of completed bookings, chunk by chunk."""
+    import numpy as np
+
+    query = select(ParkingSpot.parking_lot_id, Booking.entry_time, Booking.exit_time, Booking.cost) \
+        .join(ParkingSpot, ParkingSpot.id == Booking.spot_id) \
+        .where(Booking.exit_time.is_not(None))
+    if lot_id is not None:
+        query = query.where(ParkingSpot.parking_lot_id == lot_id)
+    result = db.session.execute(query.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        lot_ids, entry_times, exit_times, costs = zip(*rows)
+        yield (np.array(lot_ids, dtype=np.int64), np.array(entry_times, dtype='datetime64[us]'),
+               np.array(exit_times, dtype='datetime64[us]'), np.array(costs, dtype=np.float64))
+
+
+def simulate_revenue(overrides=None, lot_id=None):
+    """Re-quote every completed booking under the lots' tariffs, with ``overrides`` swapped in.
+
+    ``overrides`` maps lot ids to TariffSchedules to try instead of the
+    stored ones. Returns ``{lot_id: (bookings, recorded_revenue, quoted_revenue)}``.
+    """
+    import numpy as np
+
+    schedules = lot_schedules([lot_id] if lot_id is not None else None)
+    schedules.update(overrides or {})
+    totals = {}
+    for lot_ids, entry_times, exit_times, costs in completed_bookings(lot_id):
+        quoted = quote_batch(schedules, lot_ids, entry_times, exit_times)
+        lots, index = np.unique(lot_ids, return_inverse=True)
+        counts = np.bincount(index)
+        recorded = np.bincount(index, weights=costs)
+        requoted = np.bincount(index, weights=quoted)
+        for i, lot in enumerate(lots.tolist()):
+            bookings, old, new = totals.get(lot, (0, 0.0, 0.0))
+            totals[lot] = (bookings + int(counts[i]), old + float(recorded[i]), new + float(requoted[i]))
+    return totals
@@ -0,0 +1,185 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from parkingManagement import db
+from parkingManagement.modals import ParkingSpot, Reservation
+
+SLOT_MINUTES = 15
+# How far ahead, and for how long, a spot can be reserved
+HORIZON_DAYS = 30
+MAX_RESERVATION_HOURS = 24
+# Walk-ins are kept off spots whose reservation starts within this long
+WALK_IN_HOLD = timedelta(hours=3)
+# A reservation can be checked into this long before it starts
+CHECK_IN_EARLY = timedelta(minutes=15)
+
+_EPOCH = datetime(2000, 1, 1)
+_SLOT_SECONDS = SLOT_MINUTES * 60
+
+
+def slot_of(moment):
+    return int((moment - _EPOCH).total_seconds() // _SLOT_SECONDS)
+
+
+def slot_start(slot):
+    return _EPOCH + timedelta(seconds=slot * _SLOT_SECONDS)
+
+
+def slot_range(start, end):
+    """The slots ``[first, last)`` covering ``start`` to ``end``, widened to whole slots."""
+    first = slot_of(start)
+    last = slot_of(end)
+    if slot_start(last) < end:
+        last += 1
+    return first, max(last, first + 1)
+
+
+def align(start, end):
+    """Widen a window to slot boundaries."""
+    first, last = slot_range(start, end)
+    return slot_start(first), slot_start(last)
+
+
+class LotSlots:
+    """Upcoming reservations of one lot as a bitmask of spots per slot.
+
+    Bit ``i`` of ``slots[n]`` is set when the lot's ``i``-th spot (by id) is
+    reserved during slot ``n``; slots without reservations are absent.
+    """
+
+    __slots__ = ('spot_ids', 'bits', 'all_spots', 'slots', 'loaded_at')
+
+    def __init__(self, spot_ids, loaded_at):
+        self.spot_ids = spot_ids
+        self.bits = {spot_id: 1 << i for i, spot_id in enumerate(spot_ids)}
+        self.all_spots = (1 << len(spot_ids)) - 1
+        self.slots = {}
+        self.loaded_at = loaded_at
+
+    def mark(self, spot_id, first, last, reserved=True):
+        bit = self.bits.get(spot_id)
+        if bit is None:
+            return
+        slots = self.slots
+        for slot in range(first, last):
+            if reserved:
+                slots[slot] = slots.get(slot, 0) | bit
+            else:
+                mask = slots.get(slot, 0) & ~bit
+                if mask:
+                    slots[slot] = mask
+                else:
+                    slots.pop(slot, None)
+
+    def reserved(self, first, last):
+        # Spots reserved at any point of the window
+        mask = 0
+        slots = self.slots
+        for slot in range(first, last):
+            mask |= slots.get(slot, 0)
+        return mask
+
+    def spots(self, mask):
+        spot_ids = []
+        while mask:
+            low = mask & -mask
+            spot_ids.append(self.spot_ids[low.bit_length() - 1])
+            mask ^= low
+        return spot_ids
+
+
+class ReservationIndex:
+    """Per-lot availability bitmaps of upcoming reservations.
+
+    Time is cut into SLOT_MINUTES slots. The spots free for a window are
+    the complement of the OR of its slots' masks, so a query costs one
+    big-int OR per slot instead of a scan of the reservation table. Lots
+    load lazily and reload after ``ttl`` seconds, which brings in the
+    reservations other processes made; the conditional insert in
+    ``BookingService.reserve`` is what keeps two reservations off one spot.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lots = {}
+        self._lock = threading.Lock()
+
+    def free_count(self, lot_id, start, end):
+        lot, first, last = self._window(lot_id, start, end)
+        with self._lock:
+            return (lot.all_spots & ~lot.reserved(first, last)).bit_count()
+
+    def free_spots(self, lot_id, start, end):
+        """Ids of the lot's spots without a reservation in the window, lowest first."""
+        lot, first, last = self._window(lot_id, start, end)
+        with self._lock:
+            return lot.spots(lot.all_spots & ~lot.reserved(first, last))
+
+    def reserved_spots(self, lot_id, start, end):
+        lot, first, last = self._window(lot_id, start, end)
+        with self._lock:
+            return set(lot.spots(lot.reserved(first, last)))
+
+    def free_by_lot(self, lot_ids, start, end):
+        """``{lot_id: (free, total)}`` for a window."""
+        free = {}
+        for lot_id in lot_ids:
+            lot, first, last = self._window(lot_id, start, end)
+            with self._lock:
+                free[lot_id] = ((lot.all_spots & ~lot.reserved(first, last)).bit_count(), len(lot.spot_ids))
+        return free
+
+    def add(self, lot_id, spot_id, start, end):
+        """Record a committed reservation."""
+        self._mark(lot_id, spot_id, start, end, True)
+
+    def remove(self, lot_id, spot_id, start, end):
+        """Forget a cancelled or moved reservation."""
+        self._mark(lot_id, spot_id, start, end, False)
+
+    def invalidate(self, lot_id=None):
+        """Reload a lot (every lot when ``lot_id`` is None) on its next use."""
+        with self._lock:
+            if lot_id is None:
+                self._lots.clear()
+            else:
+                self._lots.pop(lot_id, None)
+
+    def _mark(self, lot_id, spot_id, start, end, reserved):
+        first, last = slot_range(start, end)
+        with self._lock:
+            lot = self._lots.get(lot_id)
+            if lot:
+                lot.mark(spot_id, first, last, reserved)
+
+    def _window(self, lot_id, start, end):
+        return (self._lot(lot_id), *slot_range(start, end))
+
+    def _lot(self, lot_id):
+        now = time.monotonic()
+        with self._lock:
+            lot = self._lots.get(lot_id)
+            if lot is not None and now - lot.loaded_at < self.ttl:
+                return lot
+        lot = self._load(lot_id, now)
+        with self._lock:
+            self._lots[lot_id] = lot
+        return lot
+
+    def _load(self, lot_id, loaded_at):
+        spot_ids = db.session.execute(
+            select(ParkingSpot.id).where(ParkingSpot.parking_lot_id == lot_id).order_by(ParkingSpot.id)
+        ).scalars().all()
+        lot = LotSlots(spot_ids, loaded_at)
+        rows = db.session.execute(
+            select(Reservation.spot_id, Reservation.start_time, Reservation.end_time)
+            .where(Reservation.lot_id == lot_id, Reservation.status != 'cancelled',
+                   Reservation.end_time > datetime.now())
+        )
+        for spot_id, start, end in rows:
+            lot.mark(spot_id, *slot_range(start, end))
+        return lot
+
+
+reservation_index = ReservationIndex()
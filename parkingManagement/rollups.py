@@ -0,0 +1,91 @@
+from collections import defaultdict
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from parkingManagement import db
+from parkingManagement.modals import ParkingSpot, Booking, UserMonthRollup, LotDayRollup
+
+UPSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def month_key(moment):
+    return moment.strftime('%Y-%m')
+
+
+def _upsert(dialect, model, row, keys):
+    statement = UPSERTS[dialect](model).values(**row)
+    return statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: getattr(model, name) + statement.excluded[name] for name in row if name not in keys}
+    )
+
+
+class RollupBatch:
+    """Rollup increments of one transaction, merged per row.
+
+    Both rollups are keyed on a booking's entry time, so a release lands
+    in the same row its booking was counted in. ``statements`` turns the
+    batch into one upsert per touched row.
+    """
+
+    def __init__(self):
+        # [bookings, completed, spend or revenue, occupied_hours]
+        self.users = defaultdict(lambda: [0, 0, 0.0, 0.0])
+        self.lots = defaultdict(lambda: [0, 0, 0.0, 0.0])
+
+    def __bool__(self):
+        return bool(self.users or self.lots)
+
+    def opened(self, user_id, lot_id, entry_time):
+        self.users[user_id, month_key(entry_time)][0] += 1
+        if lot_id is not None:
+            self.lots[lot_id, entry_time.date()][0] += 1
+
+    def closed(self, user_id, lot_id, entry_time, exit_time, cost):
+        hours = (exit_time - entry_time).total_seconds() / 3600
+        buckets = [self.users[user_id, month_key(entry_time)]]
+        if lot_id is not None:
+            buckets.append(self.lots[lot_id, entry_time.date()])
+        for bucket in buckets:
+            bucket[1] += 1
+            bucket[2] += cost
+            bucket[3] += hours
+
+    def user_rows(self):
+        return [{'user_id': user_id, 'month': month, 'bookings': bookings, 'completed': completed,
+                 'spend': spend, 'occupied_hours': hours}
+                for (user_id, month), (bookings, completed, spend, hours) in self.users.items()]
+
+    def lot_rows(self):
+        return [{'lot_id': lot_id, 'day': day, 'bookings': bookings, 'completed': completed,
+                 'revenue': revenue, 'occupied_hours': hours}
+                for (lot_id, day), (bookings, completed, revenue, hours) in self.lots.items()]
+
+    def statements(self, dialect):
+        return [_upsert(dialect, UserMonthRollup, row, ('user_id', 'month')) for row in self.user_rows()] + \
+            [_upsert(dialect, LotDayRollup, row, ('lot_id', 'day')) for row in self.lot_rows()]
+
+
+def rebuild_rollups(batch_size=10000):
+    """Recompute both rollup tables from the booking history in one transaction.
+
+    Returns the number of (user-month, lot-day) rows written.
+    """
+    batch = RollupBatch()
+    rows = db.session.execute(
+        select(Booking.user_id, ParkingSpot.parking_lot_id, Booking.entry_time, Booking.exit_time, Booking.cost)
+        .outerjoin(ParkingSpot, ParkingSpot.id == Booking.spot_id)
+        .execution_options(yield_per=batch_size)
+    )
+    for user_id, lot_id, entry_time, exit_time, cost in rows:
+        batch.opened(user_id, lot_id, entry_time)
+        if exit_time is not None:
+            batch.closed(user_id, lot_id, entry_time, exit_time, cost)
+
+    db.session.execute(delete(UserMonthRollup))
+    db.session.execute(delete(LotDayRollup))
+    if batch.users:
+        db.session.execute(insert(UserMonthRollup), batch.user_rows())
+    if batch.lots:
+        db.session.execute(insert(LotDayRollup), batch.lot_rows())
+    db.session.commit()
+    return len(batch.users), len(batch.lots)
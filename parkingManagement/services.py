@@ -0,0 +1,692 @@
+from datetime import datetime, timedelta
+from sqlalchemy import insert, literal, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
+from parkingManagement import app, db
+from parkingManagement.database import configure_engine
+from parkingManagement.modals import User, ParkingLot, ParkingSpot, Booking, Reservation
+from parkingManagement.allocator import spot_allocator
+from parkingManagement.events import occupancy_broker
+from parkingManagement.occupancy import occupancy_engine
+from parkingManagement import pricing
+from parkingManagement.reservations import reservation_index, align, HORIZON_DAYS, MAX_RESERVATION_HOURS, \
+    WALK_IN_HOLD, CHECK_IN_EARLY
+from parkingManagement.rollups import RollupBatch
+
+
+class BookingError(Exception):
+    """A booking request that cannot be carried out; the message is safe to show to users."""
+
+
+def quote_booking(booking, lot, exit_time):
+    price_per_hour = lot.price_per_hour if lot else 0
+    return {
+        'booking_id': booking.id,
+        'spot_id': booking.spot_id,
+        'lot_id': lot.id if lot else None,
+        'entry_time': booking.entry_time,
+        'exit_time': exit_time,
+        'duration_seconds': (exit_time - booking.entry_time).total_seconds(),
+        'price_per_hour': price_per_hour,
+        'total_cost': pricing.quote(lot, booking.entry_time, exit_time)
+    }
+
+
+def check_releasable(booking, user_id):
+    if not booking or (user_id is not None and booking.user_id != user_id):
+        raise BookingError('Invalid booking.')
+    if booking.exit_time is not None:
+        raise BookingError('Spot already released.')
+
+
+# Vehicle fields of a booking request with their column lengths
+VEHICLE_FIELDS = {'vehicle_number': 20, 'vehicle_brand': 30, 'vehicle_model': 30}
+
+
+def _check_id(item, field):
+    value = item.get(field)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise BookingError(f'{field} must be an integer.')
+
+
+def check_booking_request(item):
+    # Batch items come from JSON, so their types are checked before anything touches the session
+    _check_id(item, 'user_id')
+    _check_id(item, 'lot_id')
+    for field, max_length in VEHICLE_FIELDS.items():
+        value = item.get(field)
+        if not isinstance(value, str) or not value.strip() or len(value) > max_length:
+            raise BookingError(f'{field} must be a non-empty string of at most {max_length} characters.')
+
+
+def check_exit_request(item):
+    if item.get('booking_id') is not None:
+        _check_id(item, 'booking_id')
+        return
+    vehicle_number = item.get('vehicle_number')
+    if not isinstance(vehicle_number, str) or not vehicle_number.strip():
+        raise BookingError('Give a booking_id or a vehicle_number.')
+
+
+def _checked(check, items):
+    # The BookingError of every item that fails ``check``, None for the others
+    errors = []
+    for item in items:
+        try:
+            check(item)
+            errors.append(None)
+        except BookingError as e:
+            errors.append(e)
+    return errors
+
+
+def _known_users(items, errors):
+    # One query for the users named by every item that passed its checks
+    return select(User.id).where(User.id.in_({item['user_id'] for item, error in zip(items, errors) if error is None}))
+
+
+def check_reservation_window(start_time, end_time, now):
+    # Returns the window widened to reservation slots
+    if not start_time or not end_time or end_time <= start_time:
+        raise BookingError('The reservation must end after it starts.')
+    if start_time < now:
+        raise BookingError('Reservations must start in the future.')
+    if start_time > now + timedelta(days=HORIZON_DAYS):
+        raise BookingError(f'Reservations can be made at most {HORIZON_DAYS} days ahead.')
+    if end_time - start_time > timedelta(hours=MAX_RESERVATION_HOURS):
+        raise BookingError(f'Reservations can last at most {MAX_RESERVATION_HOURS} hours.')
+    return align(start_time, end_time)
+
+
+class BookingService:
+    """Allocate, quote and release bookings outside of any Flask view.
+
+    Works on ``db.session``. Single calls commit on their own; the batch
+    variants run every item in one transaction and return a result per
+    item, either the value or the BookingError that item raised. Items
+    only write once they are known to succeed, so a failed item never
+    leaves partial changes behind in the shared transaction.
+    """
+
+    def allocate(self, user_id, lot_id, vehicle_number, vehicle_brand, vehicle_model):
+        try:
+            booking, lot_id = self._allocate(user_id, lot_id, vehicle_number, vehicle_brand, vehicle_model)
+        except BookingError:
+            self._rollback()
+            raise
+        self._commit('Could not book a spot right now, please try again.', [(booking, lot_id)])
+        occupancy_broker.publish(lot=lot_id, spot=booking.spot_id, status='occupied')
+        return booking
+
+    def allocate_batch(self, requests):
+        errors = _checked(check_booking_request, requests)
+        user_ids = set(db.session.execute(_known_users(requests, errors)).scalars())
+        allocated = []
+        results = []
+        for item, error in zip(requests, errors):
+            if error is not None:
+                results.append(error)
+                continue
+            try:
+                if item['user_id'] not in user_ids:
+                    raise BookingError('User not found.')
+                booking, lot_id = self._allocate(
+                    item.get('user_id'), item.get('lot_id'), item.get('vehicle_number'),
+                    item.get('vehicle_brand'), item.get('vehicle_model'))
+                allocated.append((booking, lot_id))
+                results.append(booking)
+            except BookingError as e:
+                results.append(e)
+        self._commit('Could not book the spots right now, please try again.', allocated)
+        for booking, lot_id in allocated:
+            occupancy_broker.publish(lot=lot_id, spot=booking.spot_id, status='occupied')
+        return results
+
+    def quote(self, booking_id, user_id=None, exit_time=None):
+        booking = self._load(booking_id)
+        check_releasable(booking, user_id)
+        return quote_booking(booking, booking.spot.parking_lot if booking.spot else None, exit_time or datetime.now())
+
+    def quote_batch(self, booking_ids, user_id=None, exit_time=None):
+        exit_time = exit_time or datetime.now()
+        bookings = self._load_many(booking_ids)
+        results = []
+        for booking_id in booking_ids:
+            booking = bookings.get(booking_id)
+            try:
+                check_releasable(booking, user_id)
+                results.append(quote_booking(booking, booking.spot.parking_lot if booking.spot else None, exit_time))
+            except BookingError as e:
+                results.append(e)
+        return results
+
+    def release(self, booking_id, user_id=None):
+        try:
+            quote = self._release(self._load(booking_id), user_id, datetime.now())
+        except BookingError:
+            self._rollback()
+            raise
+        self._commit('Could not release the spot right now, please try again.')
+        self._released(quote)
+        return quote
+
+    def release_batch(self, booking_ids, user_id=None):
+        exit_time = datetime.now()
+        bookings = self._load_many(booking_ids)
+        results = []
+        for booking_id in booking_ids:
+            try:
+                results.append(self._release(bookings.get(booking_id), user_id, exit_time))
+            except BookingError as e:
+                results.append(e)
+        self._commit('Could not release the spots right now, please try again.')
+        for result in results:
+            if not isinstance(result, BookingError):
+                self._released(result)
+        return results
+
+    def gate_batch(self, exits, entries):
+        """Settle a burst of gate events in one transaction.
+
+        ``exits`` name a booking by ``booking_id`` or by the ``vehicle_number``
+        of its active booking; ``entries`` are allocate requests. Exits run
+        first so the spots they free can be handed to the entries of the
+        same burst. With the occupancy engine on, those spots stay occupied
+        in memory until the commit and go to this burst's entries before any
+        other free spot, so no other request can take them meanwhile and a
+        failed commit has nothing to hand back. Items with missing or
+        mistyped fields get a BookingError result like any other failed
+        item. Returns ``(exit_results, entry_results)``.
+        """
+        exit_time = datetime.now()
+        exit_errors = _checked(check_exit_request, exits)
+        valid_exits = [item for item, error in zip(exits, exit_errors) if error is None]
+        booking_ids = {item['booking_id'] for item in valid_exits if item.get('booking_id') is not None}
+        active = self._active_by_vehicle({item['vehicle_number'] for item in valid_exits
+                                          if item.get('booking_id') is None})
+        bookings = self._load_many(booking_ids | set(active.values()))
+        exit_results = []
+        for item, error in zip(exits, exit_errors):
+            if error is not None:
+                exit_results.append(error)
+                continue
+            booking_id = item.get('booking_id')
+            if booking_id is None:
+                booking_id = active.get(item['vehicle_number'])
+            try:
+                exit_results.append(self._release(bookings.get(booking_id), None, exit_time))
+            except BookingError as e:
+                exit_results.append(e)
+
+        freed = {}
+        if occupancy_engine.enabled:
+            for result in exit_results:
+                if not isinstance(result, BookingError) and result['lot_id'] is not None:
+                    freed.setdefault(result['lot_id'], []).append(result['spot_id'])
+        freed_spots = {spot_id for spot_ids in freed.values() for spot_id in spot_ids}
+
+        entry_errors = _checked(check_booking_request, entries)
+        user_ids = set(db.session.execute(_known_users(entries, entry_errors)).scalars())
+        allocated = []
+        entry_results = []
+        for item, error in zip(entries, entry_errors):
+            if error is not None:
+                entry_results.append(error)
+                continue
+            try:
+                if item['user_id'] not in user_ids:
+                    raise BookingError('User not found.')
+                booking, lot_id = self._allocate(
+                    item.get('user_id'), item.get('lot_id'), item.get('vehicle_number'),
+                    item.get('vehicle_brand'), item.get('vehicle_model'), freed=freed)
+                allocated.append((booking, lot_id))
+                entry_results.append(booking)
+            except BookingError as e:
+                entry_results.append(e)
+
+        # Spots handed over from an exit were never released in memory, so a failed commit leaves them be
+        reused = {booking.spot_id for booking, _ in allocated} & freed_spots
+        self._commit('Could not process the gate events right now, please try again.',
+                     [(booking, lot_id) for booking, lot_id in allocated if booking.spot_id not in reused])
+        for result in exit_results:
+            if not isinstance(result, BookingError) and result['spot_id'] not in reused:
+                self._released(result)
+        for booking, lot_id in allocated:
+            occupancy_broker.publish(lot=lot_id, spot=booking.spot_id, status='occupied')
+        return exit_results, entry_results
+
+    def reserve(self, user_id, lot_id, start_time, end_time, vehicle_number, vehicle_brand, vehicle_model,
+                max_attempts=5):
+        """Hold a spot of the lot for a future window and return the Reservation.
+
+        The window is widened to whole reservation slots. The spot comes
+        from the availability index; the insert only goes through if the
+        spot has no overlapping reservation in the database, so a stale
+        index costs a retry, never a double reservation. The spot's row is
+        locked first so that, on databases that run statements concurrently
+        under READ COMMITTED, a competing reservation of the same spot waits
+        for this one and then sees it.
+        """
+        start_time, end_time = check_reservation_window(start_time, end_time, datetime.now())
+        lot = db.session.get(ParkingLot, lot_id) if lot_id else None
+        if not lot:
+            raise BookingError('Parking lot not found.')
+
+        tried = set()
+        for _ in range(max_attempts):
+            spot_id = next((spot_id for spot_id in reservation_index.free_spots(lot.id, start_time, end_time)
+                            if spot_id not in tried), None)
+            if spot_id is None:
+                break
+            tried.add(spot_id)
+            # SELECT ... FOR UPDATE; SQLite has no row locks but only runs one writer at a time anyway
+            if db.session.scalar(select(ParkingSpot.id).where(ParkingSpot.id == spot_id).with_for_update()) is None:
+                continue
+            overlapping = select(Reservation.id).where(
+                Reservation.spot_id == spot_id, Reservation.status != 'cancelled',
+                Reservation.start_time < end_time, Reservation.end_time > start_time)
+            values = {'lot_id': lot.id, 'spot_id': spot_id, 'user_id': user_id, 'start_time': start_time,
+                      'end_time': end_time, 'vehicle_number': vehicle_number, 'vehicle_brand': vehicle_brand,
+                      'vehicle_model': vehicle_model, 'status': 'reserved'}
+            reservation_id = db.session.execute(
+                insert(Reservation).from_select(
+                    list(values),
+                    select(*[literal(value, getattr(Reservation, name).type) for name, value in values.items()])
+                    .where(~overlapping.exists()))
+                .returning(Reservation.id)
+            ).scalar()
+            if reservation_id is not None:
+                self._commit('Could not reserve a spot right now, please try again.')
+                reservation_index.add(lot.id, spot_id, start_time, end_time)
+                return db.session.get(Reservation, reservation_id)
+            # Someone else holds the spot then; reload what the index knows about the lot
+            reservation_index.invalidate(lot.id)
+
+        self._rollback()
+        raise BookingError('No spots can be reserved in this lot for that time.')
+
+    def cancel_reservation(self, reservation_id, user_id=None):
+        reservation = db.session.get(Reservation, reservation_id)
+        if not reservation or (user_id is not None and reservation.user_id != user_id):
+            raise BookingError('Invalid reservation.')
+        result = db.session.execute(
+            update(Reservation)
+            .where(Reservation.id == reservation.id, Reservation.status == 'reserved')
+            .values(status='cancelled')
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            self._rollback()
+            raise BookingError('Reservation is no longer active.')
+        held = (reservation.lot_id, reservation.spot_id, reservation.start_time, reservation.end_time)
+        self._commit('Could not cancel the reservation right now, please try again.')
+        reservation_index.remove(*held)
+
+    def check_in(self, reservation_id, user_id=None):
+        """Turn a reservation into a booking, on the reserved spot if it is free.
+
+        If the spot is still taken (a walk-in overstayed), any free spot
+        that nobody has reserved for the rest of the window is used.
+        """
+        reservation = db.session.get(Reservation, reservation_id)
+        now = datetime.now()
+        try:
+            if not reservation or (user_id is not None and reservation.user_id != user_id):
+                raise BookingError('Invalid reservation.')
+            if reservation.status != 'reserved':
+                raise BookingError('Reservation is no longer active.')
+            if now < reservation.start_time - CHECK_IN_EARLY:
+                raise BookingError(f'Check-in opens {int(CHECK_IN_EARLY.total_seconds() // 60)} minutes '
+                                   f'before the reservation starts.')
+            if now >= reservation.end_time:
+                raise BookingError('Reservation has expired.')
+            # Only one concurrent check-in (or cancel) of the reservation may go through
+            result = db.session.execute(
+                update(Reservation)
+                .where(Reservation.id == reservation.id, Reservation.status == 'reserved')
+                .values(status='checked_in')
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                raise BookingError('Reservation is no longer active.')
+            reserved_spot, start_time, end_time = reservation.spot_id, reservation.start_time, reservation.end_time
+            booking, lot_id = self._allocate(
+                reservation.user_id, reservation.lot_id, reservation.vehicle_number, reservation.vehicle_brand,
+                reservation.vehicle_model, reservation=reservation)
+            db.session.flush()
+            db.session.execute(
+                update(Reservation).where(Reservation.id == reservation.id)
+                .values(booking_id=booking.id, spot_id=booking.spot_id)
+                .execution_options(synchronize_session=False)
+            )
+        except BookingError:
+            self._rollback()
+            raise
+        self._commit('Could not check in right now, please try again.', [(booking, lot_id)])
+        if booking.spot_id != reserved_spot:
+            reservation_index.remove(lot_id, reserved_spot, start_time, end_time)
+            reservation_index.add(lot_id, booking.spot_id, now, end_time)
+        occupancy_broker.publish(lot=lot_id, spot=booking.spot_id, status='occupied')
+        return booking
+
+    def _allocate(self, user_id, lot_id, vehicle_number, vehicle_brand, vehicle_model, reservation=None,
+                  freed=None):
+        lot = db.session.get(ParkingLot, lot_id) if lot_id else None
+        if not lot:
+            raise BookingError('Parking lot not found.')
+
+        now = datetime.now()
+        if reservation:
+            # Its own spot, or else a free one nobody has reserved for the rest of the window
+            prefer = reservation.spot_id
+            exclude = reservation_index.reserved_spots(lot.id, now, reservation.end_time) - {prefer}
+        else:
+            # Walk-ins stay off spots that are reserved soon
+            prefer = None
+            exclude = reservation_index.reserved_spots(lot.id, now, now + WALK_IN_HOLD)
+
+        # The conditional update inside claim() guards against double-booking;
+        # with the occupancy engine on, its lock does
+        if occupancy_engine.enabled:
+            # Spots the same batch has just freed, still occupied in memory, go first
+            spot_id = next((spot_id for spot_id in (freed or {}).get(lot.id, ()) if spot_id not in exclude), None)
+            if spot_id is not None:
+                freed[lot.id].remove(spot_id)
+            else:
+                spot_id = occupancy_engine.claim(lot.id, exclude, prefer)
+        else:
+            spot_id = spot_allocator.claim(lot.id, exclude, prefer)
+        if spot_id is None:
+            raise BookingError('No free spots available in this lot.')
+
+        # Calculate cost as 1 hour for now; it is settled on release
+        booking = Booking(
+            spot_id=spot_id,
+            user_id=user_id,
+            entry_time=now,
+            exit_time=None,
+            vehicle_number=vehicle_number,
+            vehicle_brand=vehicle_brand,
+            vehicle_model=vehicle_model,
+            cost=lot.price_per_hour
+        )
+        db.session.add(booking)
+        self._rollups().opened(user_id, lot.id, booking.entry_time)
+        return booking, lot.id
+
+    def _release(self, booking, user_id, exit_time):
+        check_releasable(booking, user_id)
+        lot = booking.spot.parking_lot if booking.spot else None
+        quote = quote_booking(booking, lot, exit_time)
+
+        # Only one concurrent release of the same booking may settle it
+        result = db.session.execute(
+            update(Booking)
+            .where(Booking.id == booking.id, Booking.exit_time.is_(None))
+            .values(exit_time=exit_time, cost=quote['total_cost'])
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise BookingError('Spot already released.')
+        if not occupancy_engine.enabled:
+            db.session.execute(
+                update(ParkingSpot).where(ParkingSpot.id == booking.spot_id).values(status='free')
+                .execution_options(synchronize_session=False)
+            )
+        if lot:
+            db.session.execute(
+                update(ParkingLot).where(ParkingLot.id == lot.id)
+                .values(revenue_per_lot=ParkingLot.revenue_per_lot + quote['total_cost'])
+                .execution_options(synchronize_session=False)
+            )
+        self._rollups().closed(booking.user_id, quote['lot_id'], booking.entry_time, exit_time, quote['total_cost'])
+        return quote
+
+    def _load(self, booking_id):
+        return Booking.query.options(
+            joinedload(Booking.spot).joinedload(ParkingSpot.parking_lot).joinedload(ParkingLot.tariff)
+        ).get(booking_id)
+
+    def _load_many(self, booking_ids):
+        bookings = Booking.query.options(
+            joinedload(Booking.spot).joinedload(ParkingSpot.parking_lot).joinedload(ParkingLot.tariff)
+        ).filter(Booking.id.in_(booking_ids)).all()
+        return {booking.id: booking for booking in bookings}
+
+    def _active_by_vehicle(self, vehicle_numbers):
+        if not vehicle_numbers:
+            return {}
+        rows = db.session.execute(
+            select(Booking.vehicle_number, Booking.id)
+            .where(Booking.vehicle_number.in_(vehicle_numbers), Booking.exit_time.is_(None))
+            .order_by(Booking.entry_time)
+        ).all()
+        # A plate with several open bookings resolves to the latest one
+        return {vehicle_number: booking_id for vehicle_number, booking_id in rows}
+
+    def _rollups(self):
+        # Increments of the session's current transaction, written by _commit
+        return db.session.info.setdefault('rollups', RollupBatch())
+
+    def _rollback(self):
+        db.session.info.pop('rollups', None)
+        db.session.rollback()
+
+    def _commit(self, message, allocated=()):
+        rollups = db.session.info.pop('rollups', None)
+        try:
+            if rollups:
+                for statement in rollups.statements(db.session.get_bind().dialect.name):
+                    db.session.execute(statement)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            # The rollback undid the claims in the database but not in memory
+            if occupancy_engine.enabled:
+                for booking, lot_id in allocated:
+                    occupancy_engine.release(lot_id, booking.spot_id)
+            raise BookingError(message)
+
+    def _released(self, quote):
+        if quote['lot_id'] is not None:
+            if occupancy_engine.enabled:
+                occupancy_engine.release(quote['lot_id'], quote['spot_id'])
+            else:
+                spot_allocator.release(quote['lot_id'], quote['spot_id'])
+            occupancy_broker.publish(lot=quote['lot_id'], spot=quote['spot_id'], status='free')
+
+
+class AsyncBookingService:
+    """asyncio flavour of BookingService for ASGI deployments.
+
+    Runs the same rules over async SQLAlchemy (aiosqlite for SQLite
+    databases, which must be installed) with its own engine and sessions,
+    so it needs no Flask app or request context. Spots are claimed with the
+    conditional update alone, without the in-process free list, which is
+    why it cannot run next to the occupancy engine.
+    """
+
+    def __init__(self, database_url=None, max_claim_attempts=10):
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        if occupancy_engine.enabled:
+            raise RuntimeError('AsyncBookingService does not support OCCUPANCY_ENGINE.')
+
+        if database_url is None:
+            with app.app_context():
+                database_url = db.engine.url
+                if database_url.drivername.startswith('sqlite'):
+                    database_url = database_url.set(drivername='sqlite+aiosqlite')
+        self.engine = create_async_engine(database_url)
+        configure_engine(self.engine.sync_engine, app.config['DB_PROFILE'])
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.max_claim_attempts = max_claim_attempts
+
+    async def allocate(self, user_id, lot_id, vehicle_number, vehicle_brand, vehicle_model):
+        return (await self.allocate_batch([{
+            'user_id': user_id, 'lot_id': lot_id, 'vehicle_number': vehicle_number,
+            'vehicle_brand': vehicle_brand, 'vehicle_model': vehicle_model
+        }], raise_errors=True))[0]
+
+    async def allocate_batch(self, requests, raise_errors=False):
+        allocated = []
+        results = []
+        rollups = RollupBatch()
+        errors = _checked(check_booking_request, requests)
+        async with self.sessions() as session:
+            async with session.begin():
+                user_ids = set((await session.execute(_known_users(requests, errors))).scalars())
+                for item, error in zip(requests, errors):
+                    try:
+                        if error is not None:
+                            raise error
+                        if item['user_id'] not in user_ids:
+                            raise BookingError('User not found.')
+                        booking, lot_id = await self._allocate(session, item, rollups)
+                        allocated.append((booking, lot_id))
+                        results.append(booking)
+                    except BookingError as e:
+                        if raise_errors:
+                            raise
+                        results.append(e)
+                await self._write_rollups(session, rollups)
+        for booking, lot_id in allocated:
+            occupancy_broker.publish(lot=lot_id, spot=booking.spot_id, status='occupied')
+        return results
+
+    async def quote(self, booking_id, user_id=None, exit_time=None):
+        return (await self.quote_batch([booking_id], user_id, exit_time, raise_errors=True))[0]
+
+    async def quote_batch(self, booking_ids, user_id=None, exit_time=None, raise_errors=False):
+        exit_time = exit_time or datetime.now()
+        async with self.sessions() as session:
+            bookings = await self._load_many(session, booking_ids)
+        results = []
+        for booking_id in booking_ids:
+            booking = bookings.get(booking_id)
+            try:
+                check_releasable(booking, user_id)
+                results.append(quote_booking(booking, booking.spot.parking_lot if booking.spot else None, exit_time))
+            except BookingError as e:
+                if raise_errors:
+                    raise
+                results.append(e)
+        return results
+
+    async def release(self, booking_id, user_id=None):
+        return (await self.release_batch([booking_id], user_id, raise_errors=True))[0]
+
+    async def release_batch(self, booking_ids, user_id=None, raise_errors=False):
+        exit_time = datetime.now()
+        results = []
+        rollups = RollupBatch()
+        async with self.sessions() as session:
+            async with session.begin():
+                bookings = await self._load_many(session, booking_ids)
+                for booking_id in booking_ids:
+                    try:
+                        results.append(await self._release(session, bookings.get(booking_id), user_id, exit_time,
+                                                           rollups))
+                    except BookingError as e:
+                        if raise_errors:
+                            raise
+                        results.append(e)
+                await self._write_rollups(session, rollups)
+        for result in results:
+            if not isinstance(result, BookingError) and result['lot_id'] is not None:
+                spot_allocator.release(result['lot_id'], result['spot_id'])
+                occupancy_broker.publish(lot=result['lot_id'], spot=result['spot_id'], status='free')
+        return results
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+    async def _allocate(self, session, item, rollups):
+        lot = await session.get(ParkingLot, item.get('lot_id')) if item.get('lot_id') else None
+        if not lot:
+            raise BookingError('Parking lot not found.')
+
+        # Without the reservation index, spots reserved soon are read from the table
+        now = datetime.now()
+        reserved = (await session.scalars(
+            select(Reservation.spot_id)
+            .where(Reservation.lot_id == lot.id, Reservation.status != 'cancelled',
+                   Reservation.start_time < now + WALK_IN_HOLD, Reservation.end_time > now)
+        )).all()
+        spot_id = await self._claim(session, lot.id, reserved)
+        if spot_id is None:
+            raise BookingError('No free spots available in this lot.')
+
+        booking = Booking(
+            spot_id=spot_id,
+            user_id=item.get('user_id'),
+            entry_time=now,
+            exit_time=None,
+            vehicle_number=item.get('vehicle_number'),
+            vehicle_brand=item.get('vehicle_brand'),
+            vehicle_model=item.get('vehicle_model'),
+            cost=lot.price_per_hour
+        )
+        session.add(booking)
+        await session.flush()
+        rollups.opened(booking.user_id, lot.id, booking.entry_time)
+        return booking, lot.id
+
+    async def _claim(self, session, lot_id, exclude=()):
+        query = select(ParkingSpot.id).where(ParkingSpot.parking_lot_id == lot_id, ParkingSpot.status == 'free')
+        if exclude:
+            query = query.where(ParkingSpot.id.not_in(exclude))
+        for _ in range(self.max_claim_attempts):
+            spot_id = await session.scalar(query.limit(1))
+            if spot_id is None:
+                return None
+            result = await session.execute(
+                update(ParkingSpot)
+                .where(ParkingSpot.id == spot_id, ParkingSpot.status == 'free')
+                .values(status='occupied')
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                return spot_id
+        return None
+
+    async def _release(self, session, booking, user_id, exit_time, rollups):
+        check_releasable(booking, user_id)
+        lot = booking.spot.parking_lot if booking.spot else None
+        quote = quote_booking(booking, lot, exit_time)
+
+        result = await session.execute(
+            update(Booking)
+            .where(Booking.id == booking.id, Booking.exit_time.is_(None))
+            .values(exit_time=exit_time, cost=quote['total_cost'])
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise BookingError('Spot already released.')
+        await session.execute(
+            update(ParkingSpot).where(ParkingSpot.id == booking.spot_id).values(status='free')
+            .execution_options(synchronize_session=False)
+        )
+        if lot:
+            await session.execute(
+                update(ParkingLot).where(ParkingLot.id == lot.id)
+                .values(revenue_per_lot=ParkingLot.revenue_per_lot + quote['total_cost'])
+                .execution_options(synchronize_session=False)
+            )
+        rollups.closed(booking.user_id, quote['lot_id'], booking.entry_time, exit_time, quote['total_cost'])
+        return quote
+
+    async def _write_rollups(self, session, rollups):
+        for statement in rollups.statements(session.bind.dialect.name):
+            await session.execute(statement)
+
+    async def _load_many(self, session, booking_ids):
+        bookings = (await session.scalars(
+            select(Booking)
+            .options(joinedload(Booking.spot).joinedload(ParkingSpot.parking_lot).joinedload(ParkingLot.tariff))
+            .where(Booking.id.in_(booking_ids))
+        )).all()
+        return {booking.id: booking for booking in bookings}
+
+
+booking_service = BookingService()
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+
+
+class UserIdentity(UserMixin):
+    """Detached, read-only stand-in for a User as ``current_user``.
+
+    Carries only what views and templates read from the logged-in user;
+    load the User row when anything else is needed.
+    """
+
+    def __init__(self, id, username, name, emailId, pincode):
+        self.id = id
+        self.username = username
+        self.name = name
+        self.emailId = emailId
+        self.pincode = pincode
+
+
+class UserCache:
+    """LRU cache of UserIdentity objects with a time-to-live.
+
+    Saves the user lookup Flask-Login does on every authenticated request.
+    Entries are dropped once an ORM update or delete of the User row is
+    committed; the TTL bounds how stale anything else can make them.
+    """
+
+    def __init__(self, max_entries=4096, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, load):
+        """Return the identity for ``user_id``, calling ``load`` on a miss.
+
+        ``load`` returns a UserIdentity or None; None is not cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            invalidations = self._invalidations
+
+        identity = load()
+        if identity is not None:
+            with self._lock:
+                # An invalidation during the load may mean it read the old row
+                if invalidations != self._invalidations:
+                    return identity
+                self._entries[user_id] = (now + self.ttl, identity)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+user_cache = UserCache()
@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+import pytest
+
+# The app picks its database when it is imported; WAL and a busy timeout let test threads share it
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'test.db')
+os.environ['DB_PROFILE'] = 'tuned'
+
+from parkingManagement import app as flask_app, db  # noqa: E402
+from parkingManagement.modals import ParkingLot, ParkingSpot  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_lot(app):
+    def make_lot(spots, price_per_hour=50.0, **columns):
+        lot = ParkingLot(prime_location=columns.pop('prime_location', 'Test Lot'), address='1 Test Road',
+                         pincode=columns.pop('pincode', '560001'), price_per_hour=price_per_hour,
+                         max_spots=spots, revenue_per_lot=0.0, **columns)
+        db.session.add(lot)
+        db.session.flush()
+        db.session.add_all(ParkingSpot(parking_lot_id=lot.id, status='free') for _ in range(spots))
+        db.session.commit()
+        return lot.id
+    return make_lot
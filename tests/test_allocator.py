@@ -0,0 +1,72 @@
+import threading
+
+from sqlalchemy import func, select
+
+from parkingManagement import db
+from parkingManagement.allocator import SpotAllocator
+from parkingManagement.modals import ParkingSpot
+
+
+def claim_concurrently(app, allocator, lot_id, threads):
+    """Claim one spot per thread, each in its own session, and return what every thread got."""
+    results = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def claim():
+        with app.app_context():
+            barrier.wait()
+            spot_id = allocator.claim(lot_id)
+            db.session.commit()
+            with lock:
+                results.append(spot_id)
+
+    workers = [threading.Thread(target=claim) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def occupied(lot_id):
+    return db.session.scalar(select(func.count()).select_from(ParkingSpot).where(
+        ParkingSpot.parking_lot_id == lot_id, ParkingSpot.status == 'occupied'))
+
+
+def test_concurrent_claims_never_share_a_spot(app, make_lot):
+    lot_id = make_lot(spots=20)
+    # A small refill batch makes the threads go back to the database while others are claiming
+    results = claim_concurrently(app, SpotAllocator(refill_size=4, max_refills=50), lot_id, threads=32)
+
+    claimed = [spot_id for spot_id in results if spot_id is not None]
+    assert len(results) == 32
+    assert len(claimed) == len(set(claimed)) == 20
+    assert results.count(None) == 12
+    assert occupied(lot_id) == 20
+
+
+def test_stale_candidates_are_skipped(app, make_lot):
+    lot_id = make_lot(spots=3)
+    allocator = SpotAllocator()
+    first = allocator.claim(lot_id)
+    db.session.commit()
+    # Another worker takes the rest behind this allocator's back
+    db.session.execute(ParkingSpot.__table__.update().where(ParkingSpot.id != first).values(status='occupied'))
+    db.session.commit()
+
+    assert allocator.claim(lot_id) is None
+    assert occupied(lot_id) == 3
+
+
+def test_claim_passes_over_excluded_spots(app, make_lot):
+    lot_id = make_lot(spots=3)
+    allocator = SpotAllocator()
+    spot_ids = db.session.scalars(select(ParkingSpot.id).order_by(ParkingSpot.id)).all()
+
+    assert allocator.claim(lot_id, exclude={spot_ids[0], spot_ids[1]}) == spot_ids[2]
+    assert allocator.claim(lot_id, exclude={spot_ids[0], spot_ids[1]}) is None
+    # Excluded spots stay pooled for claims that may take them
+    assert allocator.claim(lot_id) == spot_ids[0]
+    db.session.commit()
+    assert occupied(lot_id) == 2
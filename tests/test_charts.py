@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pytest
+
+from parkingManagement import db, charts
+from parkingManagement.controllers import CHART_MAX_BARS
+from parkingManagement.modals import User, Booking, ParkingSpot, UserMonthRollup
+
+
+@pytest.fixture
+def drawn(monkeypatch):
+    """The (labels, values, title) of every chart drawn instead of its PNG."""
+    calls = []
+
+    def render_chart(labels, values, title, **style):
+        calls.append((labels, values, title))
+        return b'png'
+
+    monkeypatch.setattr(charts, 'render_chart', render_chart)
+    return calls
+
+
+def add_user(n):
+    user = User(username=f'driver{n}', password='secret1', emailId=f'driver{n}@example.com', name=f'Driver {n}',
+                address='1 Test Road', pincode='560001')
+    db.session.add(user)
+    db.session.flush()
+    return user.id
+
+
+def test_per_user_chart_keeps_the_largest_bars_in_label_order(app, make_lot, drawn):
+    spot_id = ParkingSpot.query.filter_by(parking_lot_id=make_lot(1)).one().id
+    user_ids = [add_user(n) for n in range(CHART_MAX_BARS + 10)]
+    # Users 0-9 have one booking each, the rest two
+    for n, user_id in enumerate(user_ids):
+        db.session.add_all(Booking(spot_id=spot_id, user_id=user_id, entry_time=datetime(2024, 1, 1), vehicle_number=f'KA{n}', vehicle_brand='b', vehicle_model='m',
+                                   cost=0.0) for _ in range(1 if n < 10 else 2))
+    db.session.commit()
+    admin = app.test_client()
+    with admin.session_transaction() as s:
+        s['admin_logged_in'] = True
+
+    assert admin.get('/admin/bookings_bar_chart').status_code == 200
+    labels, values, title = drawn[-1]
+    assert labels == [f'Driver {n}' for n in range(10, CHART_MAX_BARS + 10)]
+    assert values == [2] * CHART_MAX_BARS
+    assert title == f'Bookings per User (top {CHART_MAX_BARS})'
+
+
+def test_monthly_chart_keeps_the_latest_months_in_date_order(app, drawn):
+    user_id = add_user(0)
+    months = [f'{2019 + i // 12}-{i % 12 + 1:02d}' for i in range(CHART_MAX_BARS + 12)]
+    # The oldest months spent the most, so a cut by value would keep them instead
+    db.session.add_all(UserMonthRollup(user_id=user_id, month=month, bookings=1, completed=1,
+                                       spend=1000.0 - i, occupied_hours=1.0) for i, month in enumerate(months))
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['_user_id'] = str(user_id)
+        s['_fresh'] = True
+
+    assert client.get('/user/spending_over_time_chart').status_code == 200
+    labels, values, title = drawn[-1]
+    assert labels == months[-CHART_MAX_BARS:]
+    assert title == f'Spending Over Time (last {CHART_MAX_BARS})'
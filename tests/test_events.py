@@ -0,0 +1,80 @@
+import json
+import threading
+
+from parkingManagement.events import OccupancyBroker
+
+
+def read(stream, count):
+    """The next ``count`` events of an SSE stream, skipping keepalives."""
+    events = []
+    for chunk in stream:
+        if chunk.startswith('data: '):
+            events.append(json.loads(chunk[len('data: '):]))
+            if len(events) == count:
+                break
+    return events
+
+
+def test_every_subscriber_sees_every_event_in_order():
+    broker = OccupancyBroker(buffer_size=1024)
+    subscribers, published = 200, 500
+    received = [None] * subscribers
+    ready = threading.Barrier(subscribers + 1)
+
+    def subscribe(i):
+        stream = broker.stream(broker.subscribe(), keepalive=1)
+        ready.wait()
+        received[i] = read(stream, published)
+        stream.close()
+
+    threads = [threading.Thread(target=subscribe, args=(i,)) for i in range(subscribers)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    for spot in range(published):
+        broker.publish(lot=1, spot=spot, status='occupied')
+    for thread in threads:
+        thread.join(timeout=30)
+
+    expected = [{'lot': 1, 'spot': spot, 'status': 'occupied'} for spot in range(published)]
+    assert all(events == expected for events in received)
+    assert broker.subscriber_count() == 0
+
+
+def test_stream_catches_up_from_its_position():
+    broker = OccupancyBroker(buffer_size=16)
+    broker.publish(lot=1, spot=0, status='occupied')
+    position = broker.subscribe()
+    for spot in range(1, 6):
+        broker.publish(lot=1, spot=spot, status='occupied')
+
+    # Only what was published after subscribing, all of it, though nobody was reading yet
+    assert [event['spot'] for event in read(broker.stream(position), 5)] == [1, 2, 3, 4, 5]
+
+
+def test_slow_consumer_is_ended_once_the_ring_buffer_overtakes_it():
+    broker = OccupancyBroker(buffer_size=8)
+    slow = broker.stream(broker.subscribe(), keepalive=1)
+    fast = broker.stream(broker.subscribe(), keepalive=1)
+    for spot in range(8):
+        broker.publish(lot=1, spot=spot, status='occupied')
+    assert [event['spot'] for event in read(fast, 8)] == list(range(8))
+    for spot in range(8, 16):
+        broker.publish(lot=1, spot=spot, status='occupied')
+
+    # The slow stream's next event has left the buffer, so it ends instead of skipping ahead
+    assert list(slow) == []
+    # The one that kept up reads on, within the buffer
+    assert [event['spot'] for event in read(fast, 8)] == list(range(8, 16))
+    assert broker.subscriber_count() == 1
+    fast.close()
+    assert broker.subscriber_count() == 0
+
+
+def test_idle_stream_sends_keepalives():
+    broker = OccupancyBroker()
+    stream = broker.stream(broker.subscribe(), keepalive=0.01)
+    assert next(stream) == ': keepalive\n\n'
+    broker.publish(lot=2, spot=7, status='free')
+    assert read(stream, 1) == [{'lot': 2, 'spot': 7, 'status': 'free'}]
+    stream.close()
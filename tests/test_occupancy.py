@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from parkingManagement import db
+from parkingManagement.modals import User, Booking, ParkingSpot
+from parkingManagement.occupancy import OccupancyEngine
+
+
+def loaded_engine():
+    # What ensure_loaded does on startup, without the flusher thread or the flush at exit,
+    # so the tests decide when statuses are written and a "crashed" engine writes nothing
+    engine = OccupancyEngine()
+    engine._rebuild()
+    return engine
+
+
+def park(spot_id):
+    """Commit an open booking of ``spot_id``, as the booking service does after a claim."""
+    user = User.query.first()
+    if not user:
+        user = User(username='driver', password='secret1', emailId='driver@example.com', name='Driver',
+                    address='1 Test Road', pincode='560001')
+        db.session.add(user)
+        db.session.flush()
+    db.session.add(Booking(spot_id=spot_id, user_id=user.id, entry_time=datetime.now(), vehicle_number='KA01',
+                           vehicle_brand='Honda', vehicle_model='City', cost=0.0))
+    db.session.commit()
+
+
+def statuses(lot_id):
+    return dict(db.session.execute(select(ParkingSpot.id, ParkingSpot.status)
+                                   .where(ParkingSpot.parking_lot_id == lot_id)).all())
+
+
+def test_flushed_claims_survive_a_reload(app, make_lot):
+    lot_id = make_lot(spots=5)
+    engine = loaded_engine()
+    kept, released = engine.claim(lot_id), engine.claim(lot_id)
+    park(kept)
+    engine.release(lot_id, released)
+    assert statuses(lot_id)[kept] == 'free'
+
+    engine.flush()
+    assert engine.pending_count() == 0
+    assert [spot_id for spot_id, status in statuses(lot_id).items() if status == 'occupied'] == [kept]
+
+    reloaded = loaded_engine()
+    assert reloaded.occupied_by_lot() == engine.occupied_by_lot() == {lot_id: 1}
+    assert reloaded.grid(lot_id, 0, 5) == engine.grid(lot_id, 0, 5)
+    assert reloaded.spot_status(kept) == (lot_id, 'occupied')
+    assert reloaded.spot_status(released) == (lot_id, 'free')
+
+
+def test_reload_reconciles_what_was_never_flushed(app, make_lot):
+    lot_id = make_lot(spots=5)
+    engine = loaded_engine()
+    booked = engine.claim(lot_id)
+    park(booked)
+    # Claimed, but the process died before its booking was committed
+    orphaned = engine.claim(lot_id)
+    assert set(statuses(lot_id).values()) == {'free'}
+
+    # The bookings are the record of truth, whatever the spot table says
+    reloaded = loaded_engine()
+    assert reloaded.spot_status(booked) == (lot_id, 'occupied')
+    assert reloaded.spot_status(orphaned) == (lot_id, 'free')
+    assert reloaded.occupied_by_lot() == {lot_id: 1}
+    assert statuses(lot_id)[booked] == 'occupied'
+    assert statuses(lot_id)[orphaned] == 'free'
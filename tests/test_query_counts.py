@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import event, func, select
+
+from parkingManagement import db
+from parkingManagement.modals import User, ParkingLot
+
+
+@pytest.fixture
+def statements(app):
+    """Count the SQL statements the engine runs; reset ``count[0]`` before each request."""
+    count = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        count[0] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    yield count
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+def clients(app):
+    user = User(username='driver', password='secret1', emailId='driver@example.com', name='Driver',
+                address='1 Test Road', pincode='560001')
+    db.session.add(user)
+    db.session.commit()
+    user_client, admin_client = app.test_client(), app.test_client()
+    with user_client.session_transaction() as s:
+        s['_user_id'] = str(user.id)
+        s['_fresh'] = True
+    with admin_client.session_transaction() as s:
+        s['admin_logged_in'] = True
+    return {'home_page': (user_client, '/'), 'admin_home_page': (admin_client, '/admin_home')}
+
+
+@pytest.mark.parametrize('page', ['home_page', 'admin_home_page'])
+def test_statements_do_not_grow_with_lots(page, make_lot, statements, clients):
+    client, url = clients[page]
+    counts = []
+    for lots in (1, 5, 25):
+        while db.session.scalar(select(func.count(ParkingLot.id))) < lots:
+            make_lot(spots=4)
+        # The first request after adding lots may load caches; the second is the steady state
+        assert client.get(url).status_code == 200
+        statements[0] = 0
+        assert client.get(url).status_code == 200
+        counts.append(statements[0])
+    assert counts[0] == counts[1] == counts[2], f'{page} ran {counts} statements for 1, 5 and 25 lots'
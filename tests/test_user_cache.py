@@ -0,0 +1,36 @@
+from parkingManagement import db
+from parkingManagement.modals import User, load_user
+from parkingManagement.user_cache import user_cache
+
+
+def test_cached_user_is_dropped_when_the_change_commits(app):
+    user = User(username='driver', password='secret1', emailId='driver@example.com', name='Before',
+                address='1 Test Road', pincode='560001')
+    db.session.add(user)
+    db.session.commit()
+    user_cache.clear()
+    assert load_user(str(user.id)).name == 'Before'
+
+    user.name = 'After'
+    db.session.flush()
+    # Flushed but not committed: other requests still see the old row, so the entry stays
+    assert load_user(str(user.id)).name == 'Before'
+    db.session.commit()
+    assert load_user(str(user.id)).name == 'After'
+
+
+def test_rolled_back_change_leaves_the_cache_alone(app):
+    user = User(username='driver', password='secret1', emailId='driver@example.com', name='Before',
+                address='1 Test Road', pincode='560001')
+    db.session.add(user)
+    db.session.commit()
+    user_cache.clear()
+    load_user(str(user.id))
+    hits = user_cache.hits
+
+    user.name = 'Discarded'
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+    assert load_user(str(user.id)).name == 'Before'
+    assert user_cache.hits == hits + 1